@@ -0,0 +1,162 @@
+"""Версионированное JSON API лент только для чтения.
+
+Использует те же запросы, что и HTML-страницы из `posts.views`. Каждый
+ответ несёт ETag и Last-Modified, вычисленные до выполнения запросов к
+постам, поэтому неизменившаяся лента отдаёт 304 без обращения к постам и
+без сериализации.
+"""
+import hashlib
+from functools import wraps
+
+from django.db.models import Max
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .cache import get_generation
+from .feeds import FEED_ORDERING, follow_feed
+from .models import Group, Post, User
+from .paginators import CursorPaginator
+from .views import (COMMENTS_ORDERING, COMMENTS_PER_PAGE, comment_data,
+                    post_comment_list)
+
+PAGE_SIZE = 10
+
+
+def post_data(post):
+    return {
+        'id': post.id,
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'updated': post.updated.isoformat(),
+        'image': post.image.url if post.image else None,
+        'comment_count': post.comment_count,
+    }
+
+
+def page_data(queryset, request, serialize, ordering=('-pub_date', '-id'),
+              per_page=PAGE_SIZE):
+    paginator = CursorPaginator(queryset, per_page, ordering)
+    page = paginator.get_page(request.GET.get('cursor'))
+    return {
+        'results': [serialize(item) for item in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
+
+
+def _timestamp(generation):
+    return generation / 10 ** 9
+
+
+def feed_version(request, **kwargs):
+    """Версия публичных лент - поколение кеша постов: оно меняется при
+    любом изменении постов, комментариев и групп."""
+    generation = get_generation()
+    return str(generation), _timestamp(generation)
+
+
+def follow_version(request, **kwargs):
+    """Лента подписок меняется ещё и при подписке или отписке."""
+    generation = get_generation()
+    follows = get_generation(f'follow:{request.user.id}')
+    return (f'{request.user.id}:{generation}:{follows}',
+            _timestamp(max(generation, follows)))
+
+
+def post_version(request, username, post_id):
+    """Версия поста - время его правки, число комментариев, время
+    последнего комментария и поколение `comments:<id>`, которое меняется
+    при удалении комментария: иначе удаление не последнего комментария
+    не сдвигало бы Last-Modified."""
+    row = (Post.objects.filter(id=post_id, author__username=username)
+           .annotate(last_comment=Max('comments__created'))
+           .values('updated', 'comment_count', 'last_comment').first())
+    if row is None:
+        raise Http404
+    deleted = get_generation(f'comments:{post_id}')
+    modified = max(filter(None, (row['updated'], row['last_comment'])))
+    version = f'{row["updated"].isoformat()}:{row["comment_count"]}:' \
+              f'{row["last_comment"] and row["last_comment"].isoformat()}:' \
+              f'{deleted}'
+    return version, max(modified.timestamp(), _timestamp(deleted))
+
+
+def conditional(version_func):
+    """Отдаёт 304, если у клиента актуальная версия ресурса.
+
+    `version_func(request, **kwargs)` возвращает строку версии и время
+    последнего изменения (unix timestamp); от строки версии и полного пути
+    запроса (курсор входит в него) считается сильный ETag."""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            version, modified = version_func(request, **kwargs)
+            etag = quote_etag(hashlib.sha1(
+                f'{version}:{request.get_full_path()}'.encode()).hexdigest())
+            modified = int(modified)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=modified)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                response.setdefault('ETag', etag)
+                response.setdefault('Last-Modified', http_date(modified))
+            return response
+        return wrapper
+    return decorator
+
+
+def api_login_required(view_func):
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'detail': 'Требуется авторизация'},
+                                status=401)
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+@conditional(feed_version)
+def index(request):
+    return JsonResponse(page_data(Post.objects.with_related(), request,
+                                  post_data))
+
+
+@conditional(feed_version)
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    data = page_data(group.posts.with_related(), request, post_data)
+    data['group'] = {'slug': group.slug, 'title': group.title,
+                     'description': group.description}
+    return JsonResponse(data)
+
+
+@conditional(feed_version)
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return JsonResponse(page_data(Post.objects.with_related()
+                                  .filter(author=author),
+                                  request, post_data))
+
+
+@api_login_required
+@conditional(follow_version)
+def follow_index(request):
+    posts = follow_feed(request.user, Post.objects.with_related())
+    return JsonResponse(page_data(posts, request, post_data,
+                                  ordering=FEED_ORDERING))
+
+
+@conditional(post_version)
+def post_view(request, username, post_id):
+    post = get_object_or_404(Post.objects.with_related(),
+                             id=post_id, author__username=username)
+    data = post_data(post)
+    data['comments'] = page_data(post_comment_list(post.id), request,
+                                 comment_data, ordering=COMMENTS_ORDERING,
+                                 per_page=COMMENTS_PER_PAGE)
+    return JsonResponse(data)
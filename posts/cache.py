@@ -0,0 +1,54 @@
+"""Версионированный кеш страниц.
+
+В ключ кеша входит номер поколения, который меняется при любом изменении
+постов, комментариев и групп (см. `posts.signals`). Старые записи после
+этого просто перестают читаться и вытесняются по таймауту, поэтому страницы
+можно держать в кеше долго и всё равно сразу показывать новые посты.
+"""
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.views.decorators.cache import cache_page
+
+from .db import primary_reads
+
+
+def _generation_key(scope):
+    return f'generation:{scope}'
+
+
+def get_generation(scope='posts'):
+    key = _generation_key(scope)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def _set_generation(scope):
+    # не incr: в файловом кеше он неатомарен и сбрасывает timeout
+    cache.set(_generation_key(scope), time.time_ns(), timeout=None)
+
+
+def bump_generation(scope='posts'):
+    """Меняет поколение сразу и ещё раз после коммита транзакции, чтобы
+    страница, закешированная до коммита по новому ключу, тоже устарела."""
+    _set_generation(scope)
+    transaction.on_commit(lambda: _set_generation(scope))
+
+
+def cache_page_versioned(timeout, key_prefix, scope='posts'):
+    """Аналог `cache_page`, ключ которого зависит от поколения `scope`.
+    Страница для кеша читается с основной базы, а не с реплики."""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            prefix = f'{key_prefix}.{get_generation(scope)}'
+            cached_view = cache_page(timeout, key_prefix=prefix)(view_func)
+            with primary_reads():
+                return cached_view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,97 @@
+"""Денормализованные счётчики: `UserStats` и `Post.comment_count`.
+
+Счётчики меняются атомарными UPDATE ... SET x = x + 1 из сигналов
+(см. `posts.signals`). Отсутствующая строка `UserStats` не создаётся при
+изменении, а пересчитывается при первом чтении через `get_stats`;
+накопившееся расхождение исправляет команда `recount`.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserStats
+
+BATCH_SIZE = 1000
+
+
+def _bump(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def bump_user(user_id, field, delta):
+    _bump(UserStats.objects.filter(user_id=user_id), field, delta)
+
+
+def bump_comments(post_id, delta):
+    _bump(Post.objects.filter(pk=post_id), 'comment_count', delta)
+
+
+def actual_counts(user_id):
+    return {
+        'posts_count': Post.objects.filter(author_id=user_id).count(),
+        'followers_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+    }
+
+
+def recount_user(user_id):
+    stats, _ = UserStats.objects.update_or_create(
+        user_id=user_id, defaults=actual_counts(user_id))
+    return stats
+
+
+def get_stats(user):
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return recount_user(user.pk)
+
+
+def _count(queryset, field, outer='pk'):
+    counts = (queryset.filter(**{field: OuterRef(outer)})
+              .order_by().values(field)
+              .annotate(count=Count('pk')).values('count'))
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def recount_all():
+    """Исправляет расхождения счётчиков, возвращает число исправленных
+    строк `UserStats` и `Post`."""
+    missing = (User.objects.filter(stats__isnull=True)
+               .values_list('pk', flat=True).iterator())
+    batch = []
+    for user_id in missing:
+        batch.append(UserStats(user_id=user_id))
+        if len(batch) >= BATCH_SIZE:
+            UserStats.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    UserStats.objects.bulk_create(batch, ignore_conflicts=True)
+
+    stats = (UserStats.objects
+             .annotate(actual_posts=_count(Post.objects, 'author',
+                                           'user_id'),
+                       actual_followers=_count(Follow.objects, 'author',
+                                               'user_id'),
+                       actual_following=_count(Follow.objects, 'user',
+                                               'user_id'))
+             .exclude(posts_count=F('actual_posts'),
+                      followers_count=F('actual_followers'),
+                      following_count=F('actual_following')))
+    users_fixed = 0
+    for row in stats.iterator():
+        UserStats.objects.filter(pk=row.pk).update(
+            posts_count=row.actual_posts,
+            followers_count=row.actual_followers,
+            following_count=row.actual_following)
+        users_fixed += 1
+
+    posts = (Post.objects.order_by()
+             .annotate(actual=_count(Comment.objects, 'post'))
+             .exclude(comment_count=F('actual'))
+             .values_list('pk', 'actual'))
+    posts_fixed = 0
+    for post_id, actual in posts.iterator():
+        Post.objects.filter(pk=post_id).update(comment_count=actual)
+        posts_fixed += 1
+    return users_fixed, posts_fixed
@@ -0,0 +1,131 @@
+"""Постоянные соединения с базой и чтение с реплик.
+
+С `CONN_MAX_AGE` соединение переживает запрос, но Django 2.2 проверяет его
+только после ошибки в предыдущем запросе: соединение, которое закрыл
+сервер БД (перезапуск, таймаут простоя, pgbouncer), роняет следующий
+запрос. `check_connections` при `CONN_HEALTH_CHECKS` в настройках базы
+(как в новых версиях Django) проверяет открытое соединение, которое
+берётся повторно, при первом обращении к нему в запросе, и закрывает
+неработающее - запрос просто откроет новое. Базы, которые запрос не
+трогает (например, другие реплики), не проверяются.
+
+`ReplicaRouter` с `ReplicaMiddleware` отправляют чтение безопасных
+запросов на реплики из `DATABASE_REPLICAS`, а всё остальное - на основную
+базу. Страницы, которые попадают в общий кеш, читают с основной базы (см.
+`primary_reads`).
+"""
+import random
+import threading
+from contextlib import contextmanager
+from functools import partial, wraps
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.dispatch import receiver
+
+
+@receiver(request_started)
+def check_connections(**kwargs):
+    # close_old_connections Django уже отработал: открытыми остались
+    # только соединения, которые можно переиспользовать
+    for connection in connections.all():
+        if (connection.connection is None or connection.in_atomic_block
+                or not connection.settings_dict.get('CONN_HEALTH_CHECKS')):
+            continue
+        # ensure_connection вызывается перед каждым курсором и транзакцией
+        connection.ensure_connection = partial(_ensure_checked, connection)
+
+
+def _ensure_checked(connection):
+    # проверка только при первом обращении, дальше - обычный метод
+    del connection.ensure_connection
+    if connection.connection is not None and not connection.is_usable():
+        connection.close()
+    connection.ensure_connection()
+
+
+# Чтение с реплик разрешается только на время безопасного HTTP-запроса
+# (см. `ReplicaMiddleware`): команды, фоновые потоки и запись в запросе
+# читают с основной базы и не видят отставания реплик.
+_state = threading.local()
+
+PIN_COOKIE = 'use_primary'
+# сессии читаются только с основной базы: иначе сразу после входа
+# отставшая реплика не найдёт новую сессию
+PRIMARY_APPS = {'sessions'}
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+def replica_reads_allowed():
+    return getattr(_state, 'replica', False)
+
+
+@contextmanager
+def primary_reads():
+    """Чтение внутри блока идёт с основной базы. Нужно для всего, что
+    сохраняется в общий кеш: поколение кеша меняется сразу после коммита,
+    и страница, прочитанная с отставшей реплики, осталась бы в кеше под
+    новым поколением для всех пользователей."""
+    previous = replica_reads_allowed()
+    _state.replica = False
+    try:
+        yield
+    finally:
+        _state.replica = previous
+
+
+def pin_to_primary(view):
+    """Для view, которые пишут в базу на GET (подписка): чтение до конца
+    запроса и в ближайшие секунды после него идёт с основной базы."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        _state.replica = False
+        request.pinned_to_primary = True
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Чтение - со случайной реплики из `DATABASE_REPLICAS`, когда это
+    разрешено, запись и миграции - на основную базу."""
+
+    def db_for_read(self, model, **hints):
+        if (settings.DATABASE_REPLICAS and replica_reads_allowed()
+                and model._meta.app_label not in PRIMARY_APPS):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # на репликах те же данные, что на основной базе
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaMiddleware:
+    """Read-your-writes: после записи (небезопасный метод или view с
+    `pin_to_primary`) пользователь получает cookie и
+    `POSTS_REPLICA_PIN_SECONDS` секунд читает с основной базы, пока
+    реплики догоняют."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.pinned_to_primary = request.method not in SAFE_METHODS
+        _state.replica = (not request.pinned_to_primary
+                          and PIN_COOKIE not in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.replica = False
+        if request.pinned_to_primary and response.status_code < 500:
+            response.set_cookie(PIN_COOKIE, '1',
+                                max_age=settings.POSTS_REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,108 @@
+"""Материализованная лента подписок.
+
+Обычные авторы раскладывают свои посты по лентам подписчиков при
+публикации (fan-out on write). Посты авторов, у которых подписчиков больше
+`POSTS_FEED_FANOUT_MAX_FOLLOWERS`, в ленты не пишутся и подмешиваются
+при чтении (fan-out on read), чтобы один пост не порождал миллионы вставок.
+"""
+from django.conf import settings
+from django.db.models import F, Q
+
+from .counters import recount_user
+from .models import FeedEntry, Follow, Post, UserStats
+
+BATCH_SIZE = 1000
+FEED_ORDERING = ('-feed_pub_date', '-feed_post_id')
+
+
+def fanout_max_followers():
+    return getattr(settings, 'POSTS_FEED_FANOUT_MAX_FOLLOWERS', 5000)
+
+
+def backfill_size():
+    return getattr(settings, 'POSTS_FEED_BACKFILL', 1000)
+
+
+def is_fanout_author(author_id):
+    stats = (UserStats.objects.filter(user_id=author_id).first()
+             or recount_user(author_id))
+    return stats.followers_count <= fanout_max_followers()
+
+
+def read_fanout_authors(user):
+    """Авторы из подписок пользователя, чьи посты читаются напрямую."""
+    return Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gt=fanout_max_followers(),
+    ).values('author')
+
+
+def _bulk_insert(entries, batch_size=BATCH_SIZE):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    """Кладёт новый пост в ленты всех подписчиков автора."""
+    if not is_fanout_author(post.author_id):
+        return
+    followers = (Follow.objects.filter(author_id=post.author_id)
+                 .values_list('user_id', flat=True).iterator())
+    _bulk_insert(FeedEntry(user_id=user_id, post_id=post.id,
+                           pub_date=post.pub_date)
+                 for user_id in followers)
+
+
+def add_author(user_id, author_id):
+    """Добавляет в ленту последние посты автора после подписки."""
+    if not is_fanout_author(author_id):
+        return
+    posts = (Post.objects.filter(author_id=author_id)
+             .order_by('-pub_date')
+             .values_list('id', 'pub_date')[:backfill_size()])
+    _bulk_insert(FeedEntry(user_id=user_id, post_id=post_id,
+                           pub_date=pub_date)
+                 for post_id, pub_date in posts)
+
+
+def remove_author(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    FeedEntry.objects.filter(user_id=user_id,
+                             post__author_id=author_id).delete()
+
+
+def rebuild_feed(user_id):
+    FeedEntry.objects.filter(user_id=user_id).delete()
+    authors = Follow.objects.filter(user_id=user_id).values_list(
+        'author_id', flat=True)
+    for author_id in authors:
+        add_author(user_id, author_id)
+
+
+def follow_feed(user, posts=None):
+    """Посты ленты подписок: материализованные записи плюс посты
+    авторов, которые раскладываются при чтении. `posts` - из каких постов
+    выбирать, по умолчанию карточки `Post.objects.for_feed()`.
+
+    Сортировать ленту нужно по `FEED_ORDERING`: пока пользователь не
+    подписан на авторов с fan-out on read, она читается прямо по индексу
+    `FeedEntry` без сортировки постов."""
+    if posts is None:
+        posts = Post.objects.for_feed()
+    read_fanout = read_fanout_authors(user)
+    if not read_fanout.exists():
+        return (posts.filter(feed_entries__user=user)
+                .annotate(feed_pub_date=F('feed_entries__pub_date'),
+                          feed_post_id=F('feed_entries__post_id'))
+                .order_by(*FEED_ORDERING))
+    materialized = FeedEntry.objects.filter(user=user).values('post')
+    return (posts.filter(Q(pk__in=materialized)
+                         | Q(author__in=read_fanout))
+            .annotate(feed_pub_date=F('pub_date'), feed_post_id=F('id'))
+            .order_by(*FEED_ORDERING))
@@ -0,0 +1,70 @@
+"""Подписка и отписка одним запросом к БД.
+
+`follow` - идемпотентный INSERT ... ON CONFLICT DO NOTHING (INSERT IGNORE
+на MySQL) вместо SELECT и INSERT из `get_or_create`, `unfollow` - DELETE
+без предварительной выборки. По числу затронутых строк видно, изменилось
+ли что-то, и только тогда обновляются счётчики, лента подписок и
+поколение кеша - то же самое, что делают сигналы `Follow` (см.
+`posts.signals`) при создании и удалении подписки через ORM.
+"""
+from django.db import connections, router, transaction
+
+from . import counters, feeds
+from .cache import bump_generation
+from .models import Follow
+
+
+def followed(user_id, author_id):
+    counters.bump_user(author_id, 'followers_count', 1)
+    counters.bump_user(user_id, 'following_count', 1)
+    feeds.add_author(user_id, author_id)
+    bump_generation(f'follow:{user_id}')
+
+
+def unfollowed(user_id, author_id):
+    counters.bump_user(author_id, 'followers_count', -1)
+    counters.bump_user(user_id, 'following_count', -1)
+    feeds.remove_author(user_id, author_id)
+    bump_generation(f'follow:{user_id}')
+
+
+def _execute(sql, params, using):
+    """Выполняет запрос, возвращает число затронутых строк."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def _names(using):
+    ops = connections[using].ops
+    meta = Follow._meta
+    return (ops.quote_name(meta.db_table),
+            ops.quote_name(meta.get_field('user').column),
+            ops.quote_name(meta.get_field('author').column))
+
+
+def follow(user_id, author_id):
+    """Подписывает пользователя на автора; True, если подписки не было."""
+    using = router.db_for_write(Follow)
+    ops = connections[using].ops
+    table, user, author = _names(using)
+    sql = (f'{ops.insert_statement(ignore_conflicts=True)} {table} '
+           f'({user}, {author}) VALUES (%s, %s) '
+           f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}')
+    with transaction.atomic(using=using):
+        created = _execute(sql, [user_id, author_id], using) > 0
+        if created:
+            followed(user_id, author_id)
+    return created
+
+
+def unfollow(user_id, author_id):
+    """Отписывает пользователя от автора; True, если подписка была."""
+    using = router.db_for_write(Follow)
+    table, user, author = _names(using)
+    sql = f'DELETE FROM {table} WHERE {user} = %s AND {author} = %s'
+    with transaction.atomic(using=using):
+        deleted = _execute(sql, [user_id, author_id], using) > 0
+        if deleted:
+            unfollowed(user_id, author_id)
+    return deleted
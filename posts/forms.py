@@ -17,6 +17,17 @@ class PostForm(forms.ModelForm):
                                    required=False)
     text = forms.CharField(widget=forms.Textarea)
 
+    def __init__(self, *args, upload_errors=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_errors = upload_errors or {}
+
+    def clean(self):
+        # файл, отклонённый при загрузке, в request.FILES не попадает
+        for field, message in self.upload_errors.items():
+            if field in self.fields:
+                self.add_error(field, message)
+        return super().clean()
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,315 @@
+"""Нагрузочный прогон: смесь запросов из JSON Lines проигрывается прямо
+через WSGI-приложение `yatube.wsgi` в нескольких потоках-клиентах.
+
+Строка смеси - один вид запроса:
+
+    {"path": "/{username}/{post_id}/", "weight": 5, "auth": false}
+
+`weight` - относительная частота, `auth` - запрос от залогиненного
+пользователя, `method` и `data` (поля формы) - для POST. В `path` и `data`
+подставляются случайные `{username}`, `{post_id}` (пост этого автора),
+`{group}` и `{word}` (слово из текстов постов) из данных в базе.
+"""
+import asyncio
+import io
+import json
+import random
+import string
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from urllib.parse import quote, unquote_to_bytes, urlencode, urlsplit
+
+from django.conf import settings
+from django.db import connections
+from django.test import Client
+from django.urls import Resolver404, resolve
+from django.utils.crypto import get_random_string
+
+from .models import Group, Post, User
+
+WORDS_SAMPLE = 200
+
+
+def load_mix(path):
+    mix = []
+    with open(path, encoding='utf-8') as file:
+        for number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            entry = json.loads(line)
+            if 'path' not in entry:
+                raise ValueError(f'Строка {number}: нет поля path')
+            entry.setdefault('method', 'GET')
+            entry.setdefault('weight', 1)
+            entry.setdefault('auth', False)
+            mix.append(entry)
+    if not mix:
+        raise ValueError('Смесь запросов пуста')
+    return mix
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    if not values:
+        return 0
+    values = sorted(values)
+    rank = max(1, round(percent / 100 * len(values) + 0.5))
+    return values[min(rank, len(values)) - 1]
+
+
+class Sample:
+    """Случайные значения для подстановки в пути запросов."""
+
+    def __init__(self, sessions=20, rng=None):
+        self.rng = rng or random.Random()
+        self.posts = list(Post.objects.order_by('?')
+                          .values_list('author__username', 'id')[:1000])
+        self.groups = list(Group.objects.values_list('slug', flat=True))
+        words = set()
+        for text in Post.objects.values_list('text', flat=True)[
+                :WORDS_SAMPLE]:
+            words.update(word for word in text.split() if word.isalpha())
+        self.words = sorted(words) or ['пост']
+        self.csrf_token = get_random_string(
+            64, string.ascii_letters + string.digits)
+        self.cookies = []
+        for user in User.objects.filter(is_active=True).order_by('?')[
+                :sessions]:
+            client = Client()
+            client.force_login(user)
+            session = client.cookies[settings.SESSION_COOKIE_NAME].value
+            self.cookies.append(
+                f'{settings.SESSION_COOKIE_NAME}={session}; '
+                f'{settings.CSRF_COOKIE_NAME}={self.csrf_token}')
+        self._lock = threading.Lock()
+
+    def values(self):
+        with self._lock:
+            username, post_id = (self.rng.choice(self.posts)
+                                 if self.posts else ('', 0))
+            return {
+                'username': username,
+                'post_id': post_id,
+                'group': self.rng.choice(self.groups) if self.groups else '',
+                'word': self.rng.choice(self.words),
+            }
+
+    def cookie(self):
+        with self._lock:
+            return self.rng.choice(self.cookies) if self.cookies else ''
+
+
+def make_environ(method, path, body=b'', cookie=''):
+    url = urlsplit(path)
+    # строки окружения WSGI - байты в latin-1 (PEP 3333)
+    return {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': unquote_to_bytes(url.path).decode('iso-8859-1'),
+        'QUERY_STRING': quote(url.query, safe='=&%+'),
+        'SCRIPT_NAME': '',
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'HTTP_HOST': 'testserver',
+        'HTTP_COOKIE': cookie,
+        'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+
+
+def url_name(path):
+    try:
+        match = resolve(urlsplit(path).path)
+    except Resolver404:
+        return 'not_found'
+    return match.view_name or match.func.__name__
+
+
+def count_queries(func):
+    """Выполняет `func()` в текущем потоке, возвращает (результат, число
+    запросов к БД)."""
+    queries = 0
+
+    def count(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(count))
+        result = func()
+    return result, queries
+
+
+def consume(application, environ, start_response):
+    response = application(environ, start_response)
+    try:
+        return b''.join(response)
+    finally:
+        if hasattr(response, 'close'):
+            response.close()
+
+
+def call(application, environ):
+    """Выполняет запрос, возвращает (статус, секунды, число запросов к БД)."""
+    status = []
+
+    def start_response(value, headers, exc_info=None):
+        status.append(int(value.split()[0]))
+
+    started = time.perf_counter()
+    _, queries = count_queries(
+        lambda: consume(application, environ, start_response))
+    return status[0], time.perf_counter() - started, queries
+
+
+def make_plan(mix, sample, requests, seed):
+    """Запросы прогона: (url_name, метод, путь, тело, cookie)."""
+    rng = random.Random(seed)
+    weights = [entry['weight'] for entry in mix]
+    for entry in rng.choices(mix, weights=weights, k=requests):
+        values = sample.values()
+        path = entry['path'].format(**values)
+        body = urlencode({key: str(value).format(**values)
+                          for key, value in
+                          entry.get('data', {}).items()}).encode()
+        cookie = sample.cookie() if entry['auth'] else ''
+        yield (entry.get('name') or url_name(path), entry['method'], path,
+               body, cookie)
+
+
+def run(application, mix, sample, clients=4, requests=1000, seed=None):
+    """Проигрывает `requests` запросов в `clients` потоках.
+
+    Возвращает список (url_name, статус, секунды, запросы к БД) и общее
+    время прогона."""
+    plan = iter(list(make_plan(mix, sample, requests, seed)))
+    results = []
+    lock = threading.Lock()
+
+    def client():
+        try:
+            while True:
+                with lock:
+                    request = next(plan, None)
+                if request is None:
+                    return
+                name, method, path, body, cookie = request
+                environ = make_environ(method, path, body, cookie)
+                if method != 'GET':
+                    environ['HTTP_X_CSRFTOKEN'] = sample.csrf_token
+                status, elapsed, queries = call(application, environ)
+                with lock:
+                    results.append((name, status, elapsed, queries))
+        finally:
+            connections.close_all()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        for future in [executor.submit(client) for _ in range(clients)]:
+            future.result()
+    return results, time.perf_counter() - started
+
+
+def run_asgi(application, mix, sample, clients=4, requests=1000, seed=None,
+             threads=4):
+    """То же, что `run`, но через ASGI-адаптер из `yatube.asgi`: клиенты -
+    корутины в одном цикле событий, запросы выполняются в пуле из
+    `threads` потоков."""
+    from yatube.asgi import ThreadPoolWsgiToAsgi
+
+    queries = {}
+
+    def counted(environ, start_response):
+        # выполняется в потоке пула: там же считаем запросы к БД
+        body, count = count_queries(
+            lambda: consume(application, environ, start_response))
+        queries[environ['HTTP_X_LOADTEST_ID']] = count
+        return [body]
+
+    asgi_application = ThreadPoolWsgiToAsgi(counted, threads)
+    plan = iter(enumerate(make_plan(mix, sample, requests, seed)))
+    results = []
+
+    async def call_asgi(request_id, method, path, body, cookie):
+        url = urlsplit(path)
+        headers = [(b'host', b'testserver'),
+                   (b'cookie', cookie.encode()),
+                   (b'content-type', b'application/x-www-form-urlencoded'),
+                   (b'content-length', str(len(body)).encode()),
+                   (b'x-loadtest-id', str(request_id).encode())]
+        if method != 'GET':
+            headers.append((b'x-csrftoken', sample.csrf_token.encode()))
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'},
+            'http_version': '1.1', 'method': method, 'scheme': 'http',
+            'path': unquote_to_bytes(url.path).decode(),
+            'raw_path': url.path.encode(),
+            'query_string': quote(url.query, safe='=&%+').encode(),
+            'root_path': '', 'headers': headers,
+            'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+        }
+        messages = [{'type': 'http.request', 'body': body}]
+        status = []
+
+        async def receive():
+            return messages.pop() if messages else {
+                'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        await asgi_application(scope, receive, send)
+        return status[0]
+
+    async def client():
+        for request_id, (name, method, path, body, cookie) in plan:
+            started = time.perf_counter()
+            status = await call_asgi(request_id, method, path, body, cookie)
+            results.append((name, status, time.perf_counter() - started,
+                            queries.pop(str(request_id), 0)))
+
+    async def main():
+        await asyncio.gather(*(client() for _ in range(clients)))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    return results, time.perf_counter() - started
+
+
+def report(results, wall_time):
+    """Строки отчёта по url_name: число запросов, ошибок, RPS,
+    p50/p95/p99 в миллисекундах и среднее число запросов к БД."""
+    groups = defaultdict(list)
+    for name, status, elapsed, queries in results:
+        groups[name].append((status, elapsed, queries))
+    groups['total'] = [row[1:] for row in results]
+    rows = []
+    for name, items in groups.items():
+        latencies = [elapsed * 1000 for _, elapsed, _ in items]
+        rows.append({
+            'url_name': name,
+            'requests': len(items),
+            'errors': sum(1 for status, _, _ in items if status >= 500),
+            'rps': round(len(items) / wall_time, 1) if wall_time else 0,
+            'p50': round(percentile(latencies, 50), 1),
+            'p95': round(percentile(latencies, 95), 1),
+            'p99': round(percentile(latencies, 99), 1),
+            'queries': round(sum(q for _, _, q in items) / len(items), 1),
+        })
+    return rows
@@ -0,0 +1,128 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from posts import counters, feeds
+from posts.models import Comment, Follow, Group, Post, User
+from posts.paginators import CursorPaginator
+from posts.views import COMMENTS_ORDERING, COMMENTS_PER_PAGE
+
+# Признаки плана без подходящего индекса: полный проход по таблице или
+# сортировка результата вместо чтения индекса по порядку
+BAD_PLANS = {
+    'sqlite': [
+        (re.compile(r'\bSCAN (?:TABLE )?\w+(?: AS \w+)?\s*$', re.M),
+         'полный проход по таблице'),
+        (re.compile(r'USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY'),
+         'сортировка без индекса'),
+    ],
+    'postgresql': [
+        (re.compile(r'Seq Scan on'), 'полный проход по таблице'),
+        (re.compile(r'^\s*(?:->\s*)?Sort\b', re.M),
+         'сортировка без индекса'),
+    ],
+    'mysql': [
+        (re.compile(r'\bALL\b'), 'полный проход по таблице'),
+        (re.compile(r'Using filesort'), 'сортировка без индекса'),
+    ],
+}
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN для запросов лент из posts/views.py и '
+            'завершается с ошибкой, если какой-то из них не использует '
+            'индексы')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=2000,
+                            help='Сколько тестовых постов создать перед '
+                                 'проверкой (всё откатывается в конце)')
+
+    def seed(self, size):
+        User.objects.bulk_create(
+            User(username=f'explain_feeds_{i}') for i in range(20))
+        users = list(User.objects.filter(username__startswith='explain_feeds_'))
+        Group.objects.bulk_create(
+            Group(title=f'Группа {i}', slug=f'explain-feeds-{i}',
+                  description='') for i in range(5))
+        groups = list(Group.objects.filter(slug__startswith='explain-feeds-'))
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=users[i % len(users)],
+                 group=groups[i % len(groups)] if i % 3 else None)
+            for i in range(size))
+        Follow.objects.bulk_create(
+            Follow(user=users[0], author=author) for author in users[1:6])
+        post = Post.objects.filter(author=users[1]).first()
+        Comment.objects.bulk_create(
+            Comment(post=post, author=users[i % len(users)],
+                    text=f'Комментарий {i}') for i in range(size // 10))
+        counters.recount_all()
+        feeds.rebuild_feed(users[0].id)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def feed_queries(self):
+        """Те же запросы, что выполняют страницы лент."""
+        author = User.objects.filter(posts__isnull=False).first()
+        user = User.objects.filter(follower__isnull=False).first() or author
+        group = Group.objects.filter(posts__isnull=False).first()
+        post = Post.objects.filter(comments__isnull=False).first() \
+            or Post.objects.first()
+        keyset = ('-pub_date', '-id')
+        queries = {
+            'index': (Post.objects.for_feed(), 10, keyset),
+            'profile': (Post.objects.for_feed().filter(author=author), 10,
+                        keyset),
+            'follow_index': (feeds.follow_feed(user), 10,
+                             feeds.FEED_ORDERING),
+            'post_view comments': (
+                Comment.objects.select_related('author').filter(post=post),
+                COMMENTS_PER_PAGE, COMMENTS_ORDERING),
+        }
+        if group is not None:
+            queries['group_posts'] = (group.posts.for_feed(), 10, keyset)
+        for name, (queryset, per_page, ordering) in queries.items():
+            yield name, queryset.order_by(*ordering)[:per_page]
+            cursor_query = self.cursor_query(queryset, per_page, ordering)
+            if cursor_query is not None:
+                yield f'{name} (cursor)', cursor_query
+
+    def cursor_query(self, queryset, per_page, ordering):
+        """Запрос второй страницы курсорной ленты: курсор берётся с первой
+        страницы засеянных данных, как его получил бы браузер."""
+        paginator = CursorPaginator(queryset, per_page, ordering)
+        page = paginator.get_page()
+        if not page:
+            return None
+        cursor = page.next_cursor or paginator.encode_cursor(page[0], 'next')
+        direction, values = paginator.decode_cursor(cursor)
+        return (queryset.filter(paginator._keyset_filter(values, False))
+                .order_by(*ordering)[:per_page + 1])
+
+    def handle(self, *args, **options):
+        patterns = BAD_PLANS.get(connection.vendor)
+        if patterns is None:
+            raise CommandError(
+                f'Нет правил разбора EXPLAIN для {connection.vendor}')
+        problems = []
+        with transaction.atomic():
+            if options['seed']:
+                self.seed(options['seed'])
+            for name, queryset in self.feed_queries():
+                plan = queryset.explain()
+                found = [reason for pattern, reason in patterns
+                         if pattern.search(plan)]
+                if found:
+                    problems.append(name)
+                    self.stdout.write(self.style.ERROR(
+                        f'{name}: {", ".join(found)}'))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'{name}: OK'))
+                if options['verbosity'] > 1 or found:
+                    self.stdout.write(plan)
+            transaction.set_rollback(True)
+        if problems:
+            raise CommandError(
+                f'Запросы без индексов: {", ".join(problems)}')
@@ -0,0 +1,36 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts.transfer import export_records, open_dump
+
+
+class Command(BaseCommand):
+    help = ('Выгружает пользователей, группы, посты, комментарии и подписки '
+            'в JSON Lines (по записи на строку) для import_yatube')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?', default='-',
+                            help='Файл выгрузки (.gz - со сжатием), '
+                                 'по умолчанию - stdout')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Сколько записей читать из БД за раз')
+        parser.add_argument('--media', metavar='DIR',
+                            help='Скопировать картинки постов в этот каталог')
+
+    def handle(self, *args, **options):
+        file = open_dump(options['output'], 'w')
+        out = file or sys.stdout
+        try:
+            counts, missing = export_records(out, options['batch_size'],
+                                             options['media'])
+        finally:
+            if file is not None:
+                file.close()
+        # при выгрузке в stdout итог пишем в stderr, чтобы не испортить файл
+        report = self.stdout if file is not None else self.stderr
+        report.write(self.style.SUCCESS('Выгружено: ' + ', '.join(
+            f'{label} - {count}' for label, count in counts.items())))
+        if missing:
+            report.write(self.style.WARNING(
+                f'Не найдено файлов картинок: {missing}'))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.media_gc import Collector
+
+KINDS = {
+    'originals': 'картинок без постов',
+    'kvstore': 'записей kvstore без постов',
+    'thumbnails': 'миниатюр без записей kvstore',
+}
+
+
+class Command(BaseCommand):
+    help = ('Удаляет картинки постов, миниатюры и записи kvstore sorl, '
+            'на которые больше ничего не ссылается')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать, что будет удалено')
+        parser.add_argument('--min-age', type=int, default=3600,
+                            help='Не трогать файлы моложе стольких секунд')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Сколько имён сверять с базой за раз')
+
+    def log(self, kind, name):
+        if self.verbosity > 1:
+            self.stdout.write(f'{kind}: {name}')
+
+    def handle(self, *args, **options):
+        if options['min_age'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--min-age и --batch-size должны быть '
+                               'положительными')
+        self.verbosity = options['verbosity']
+        found = Collector(dry_run=options['dry_run'],
+                          min_age=options['min_age'],
+                          batch_size=options['batch_size'],
+                          log=self.log).run()
+        verb = 'Найдено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(f'{verb} ' + ', '.join(
+            f'{label}: {found[kind]}' for kind, label in KINDS.items())))
@@ -0,0 +1,70 @@
+import os
+import sys
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts.cache import bump_generation
+from posts.transfer import Checkpoint, Importer, open_dump
+
+
+class Command(BaseCommand):
+    help = ('Загружает выгрузку export_yatube пачками через bulk_create и '
+            'пересчитывает счётчики, ленты и поисковый индекс')
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Файл выгрузки (.gz - сжатый, '
+                                          '- - stdin)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Сколько записей вставлять одним запросом')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Число потоков загрузки (0 - в текущем '
+                                 'потоке; на SQLite всегда 0)')
+        parser.add_argument('--media', metavar='DIR',
+                            help='Каталог с картинками из export_yatube '
+                                 '--media')
+        parser.add_argument('--checkpoint',
+                            help='Файл с отметкой прогресса (по умолчанию '
+                                 '<input>.checkpoint)')
+        parser.add_argument('--restart', action='store_true',
+                            help='Начать сначала, не продолжая с отметки')
+        parser.add_argument('--skip-rebuild', action='store_true',
+                            help='Не пересчитывать счётчики, ленты и '
+                                 'поисковый индекс')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if connection.vendor == 'sqlite' and workers:
+            # SQLite допускает только одного пишущего
+            workers = 0
+        path = options['checkpoint']
+        if path is None and options['input'] != '-':
+            path = f'{options["input"]}.checkpoint'
+        if options['restart'] and path and os.path.exists(path):
+            os.remove(path)
+        checkpoint = Checkpoint(path)
+        if checkpoint.line:
+            self.stdout.write(f'Продолжаем со строки {checkpoint.line + 1}')
+
+        file = open_dump(options['input'], 'r')
+        importer = Importer(options['batch_size'], workers, checkpoint,
+                            options['media'])
+        try:
+            counts = importer.run(file or sys.stdin)
+        except (ValueError, KeyError) as error:
+            raise CommandError(
+                f'Некорректная выгрузка: {error}. Загруженное сохранено, '
+                f'повторный запуск продолжит с последней отметки')
+        finally:
+            if file is not None:
+                file.close()
+        checkpoint.remove()
+        self.stdout.write(self.style.SUCCESS('Загружено: ' + ', '.join(
+            f'{label} - {count}' for label, count in counts.items())))
+
+        bump_generation()
+        if not options['skip_rebuild']:
+            for command in ('recount', 'rebuild_feeds',
+                            'rebuild_search_index'):
+                call_command(command, stdout=self.stdout)
@@ -0,0 +1,74 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import loadtest
+
+DEFAULT_MIX = os.path.join(os.path.dirname(loadtest.__file__),
+                           'loadtest_mix.jsonl')
+COLUMNS = ('url_name', 'requests', 'errors', 'rps', 'p50', 'p95', 'p99',
+           'queries')
+
+
+class Command(BaseCommand):
+    help = ('Проигрывает смесь запросов через WSGI-приложение в нескольких '
+            'потоках и выводит задержки, RPS и число запросов к БД '
+            'по url_name')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mix', default=DEFAULT_MIX,
+                            help='Смесь запросов в JSON Lines')
+        parser.add_argument('--clients', type=int, default=4,
+                            help='Число одновременных клиентов')
+        parser.add_argument('--requests', type=int, default=1000,
+                            help='Сколько всего запросов выполнить')
+        parser.add_argument('--seed', type=int,
+                            help='Зерно генератора для повторяемых прогонов')
+        parser.add_argument('--asgi', action='store_true',
+                            help='Проигрывать через ASGI (yatube.asgi): '
+                                 'клиенты - корутины, запросы - в пуле '
+                                 'потоков')
+        parser.add_argument('--threads', type=int, default=4,
+                            help='Размер пула потоков в режиме --asgi')
+        parser.add_argument('--output',
+                            help='Сохранить отчёт в JSON для сравнения '
+                                 'прогонов')
+
+    def handle(self, *args, **options):
+        from yatube.wsgi import application
+
+        try:
+            mix = loadtest.load_mix(options['mix'])
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Не удалось прочитать смесь: {error}')
+        sample = loadtest.Sample()
+        if options['asgi']:
+            results, wall_time = loadtest.run_asgi(
+                application, mix, sample, clients=options['clients'],
+                requests=options['requests'], seed=options['seed'],
+                threads=options['threads'])
+        else:
+            results, wall_time = loadtest.run(
+                application, mix, sample, clients=options['clients'],
+                requests=options['requests'], seed=options['seed'])
+        rows = loadtest.report(results, wall_time)
+
+        widths = {column: max(len(column), *(len(str(row[column]))
+                                             for row in rows))
+                  for column in COLUMNS}
+        self.stdout.write('  '.join(column.rjust(widths[column])
+                                    for column in COLUMNS))
+        for row in rows:
+            self.stdout.write('  '.join(str(row[column]).rjust(widths[column])
+                                        for column in COLUMNS))
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump({'clients': options['clients'],
+                           'asgi': options['asgi'],
+                           'wall_time': wall_time, 'rows': rows},
+                          file, ensure_ascii=False, indent=2)
+        errors = rows[-1]['errors']
+        if errors:
+            self.stdout.write(self.style.WARNING(
+                f'Ответов с ошибкой 5xx: {errors}'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import feeds
+from posts.models import Follow, User
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает материализованные ленты подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*',
+                            help='Пользователи, чьи ленты перестроить '
+                                 '(по умолчанию - все подписчики)')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(
+            id__in=Follow.objects.values('user_id')).order_by('id')
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+        count = 0
+        for user_id in users.values_list('id', flat=True).iterator():
+            with transaction.atomic():
+                feeds.rebuild_feed(user_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Перестроено лент: {count}'))
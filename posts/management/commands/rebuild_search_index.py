@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import search
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает обратный индекс поиска по постам'
+
+    def handle(self, *args, **options):
+        if search.uses_postgres():
+            self.stdout.write('На PostgreSQL используется GIN-индекс, '
+                              'перестраивать нечего')
+            return
+        count = 0
+        for post in Post.objects.only('id', 'text').iterator():
+            with transaction.atomic():
+                search.index_post(post)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов: {count}'))
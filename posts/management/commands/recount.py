@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount_all
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики постов, подписок и комментариев '
+            'и исправляет расхождения')
+
+    def handle(self, *args, **options):
+        users_fixed, posts_fixed = recount_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счётчиков пользователей: {users_fixed}, '
+            f'постов: {posts_fixed}'))
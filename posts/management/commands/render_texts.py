@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import rendering
+from posts.cache import bump_generation
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = ('Заполняет готовый HTML текста постов и комментариев там, где '
+            'его нет (строки из bulk_create), или везде с --all')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Перерисовать все строки, например после '
+                                 'изменения правил отрисовки')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Сколько строк обновлять за раз')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным')
+        kwargs = {'everything': options['all'],
+                  'batch_size': options['batch_size']}
+        posts = rendering.backfill(Post.objects.all(), rendering.render_post,
+                                   rendering.POST_FIELDS, **kwargs)
+        comments = rendering.backfill(
+            Comment.objects.all(), rendering.render_comment,
+            rendering.COMMENT_FIELDS, **kwargs)
+        if posts or comments:
+            bump_generation()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено постов: {posts}, комментариев: {comments}'))
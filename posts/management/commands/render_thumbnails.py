@@ -0,0 +1,66 @@
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.models import Post
+from posts.thumbnails import render_thumbnails
+
+
+def render_batch(names):
+    try:
+        return sum(render_thumbnails(name) for name in names)
+    finally:
+        connections.close_all()
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = ('Создаёт недостающие миниатюры картинок постов '
+            'параллельно на всех ядрах')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Число процессов (по умолчанию - по числу '
+                                 'ядер, 0 - в текущем процессе)')
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Сколько картинок отдавать процессу за раз')
+
+    def handle(self, *args, **options):
+        names = (Post.objects.exclude(image='').exclude(image__isnull=True)
+                 .order_by('image').values_list('image', flat=True)
+                 .distinct().iterator())
+        if not options['workers']:
+            rendered = sum(render_thumbnails(name) for name in names)
+            self.stdout.write(self.style.SUCCESS(
+                f'Подготовлено миниатюр: {rendered}'))
+            return
+        # spawn, а не fork: дочерние процессы не должны унаследовать
+        # открытое соединение с БД
+        pool = ProcessPoolExecutor(
+            max_workers=options['workers'],
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup)
+        rendered = 0
+        pending = set()
+        with pool:
+            for batch in batches(names, options['batch_size']):
+                pending.add(pool.submit(render_batch, batch))
+                if len(pending) >= options['workers'] * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    rendered += sum(future.result() for future in done)
+            rendered += sum(future.result() for future in pending)
+        self.stdout.write(self.style.SUCCESS(
+            f'Подготовлено миниатюр: {rendered}'))
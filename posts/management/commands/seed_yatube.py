@@ -0,0 +1,133 @@
+import io
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from PIL import Image
+
+from posts.cache import bump_generation
+from posts.models import Comment, Follow, Group, Post, User
+from posts.storage import image_storage
+from posts.transfer import preserve_timestamps
+
+BATCH_SIZE = 1000
+WORDS = '''
+    город лето море книга дорога друг утро вечер солнце дождь река лес
+    кофе работа отпуск горы музыка фильм поезд небо снег праздник сад
+    новый старый тихий яркий долгий быстрый тёплый холодный красивый
+    гулять читать писать смотреть ехать встречать готовить думать
+'''.split()
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, постами, '
+            'подписками, комментариями и картинками для нагрузочных '
+            'прогонов (см. команду loadtest)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Подписок на пользователя')
+        parser.add_argument('--comments', type=int, default=5000)
+        parser.add_argument('--images', type=int, default=20,
+                            help='Сколько разных картинок создать')
+        parser.add_argument('--image-share', type=float, default=0.2,
+                            help='Доля постов с картинкой')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней разбросать даты постов')
+        parser.add_argument('--prefix', default='load_',
+                            help='Префикс имён пользователей и групп')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Зерно генератора случайных чисел')
+
+    def bulk(self, model, objects):
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= BATCH_SIZE:
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        model.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def text(self, rng, words):
+        return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+    def authors(self, rng, users, user_id, count):
+        """`count` случайных авторов, кроме самого пользователя, без копии
+        списка всех пользователей на каждого."""
+        authors = rng.sample(users, count + 1)
+        if user_id in authors:
+            authors.remove(user_id)
+        return authors[:count]
+
+    def images(self, rng, count):
+        names = []
+        for i in range(count):
+            image = Image.new('RGB', (1280, 720), tuple(
+                rng.randrange(256) for _ in range(3)))
+            buffer = io.BytesIO()
+            image.save(buffer, 'JPEG', quality=85)
+            names.append(image_storage.save(
+                f'posts/seed_{i}.jpg', ContentFile(buffer.getvalue())))
+        return names
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        prefix = options['prefix']
+        password = make_password(None)
+        self.bulk(User, (User(username=f'{prefix}{i}', password=password)
+                         for i in range(options['users'])))
+        users = list(User.objects.filter(username__startswith=prefix)
+                     .values_list('id', flat=True))
+        self.bulk(Group, (Group(title=f'Группа {i}', slug=f'{prefix}{i}',
+                                description=self.text(rng, 10))
+                          for i in range(options['groups'])))
+        groups = list(Group.objects.filter(slug__startswith=prefix)
+                      .values_list('id', flat=True)) or [None]
+        images = self.images(rng, options['images'])
+
+        now = timezone.now()
+        seconds = options['days'] * 24 * 60 * 60
+
+        def pub_date():
+            return now - timedelta(seconds=rng.randrange(seconds))
+
+        def posts():
+            for _ in range(options['posts']):
+                date = pub_date()
+                image = (rng.choice(images) if images
+                         and rng.random() < options['image_share'] else None)
+                yield Post(text=self.text(rng, rng.randint(5, 60)),
+                           author_id=rng.choice(users),
+                           group_id=rng.choice(groups + [None]),
+                           image=image, pub_date=date, updated=date)
+
+        follows = min(options['follows'], len(users) - 1)
+        with preserve_timestamps():
+            self.bulk(Post, posts())
+            post_ids = list(Post.objects.filter(author_id__in=users)
+                            .values_list('id', flat=True))
+            self.bulk(Follow, (Follow(user_id=user_id, author_id=author_id)
+                               for user_id in users
+                               for author_id in self.authors(
+                                   rng, users, user_id, follows)))
+            self.bulk(Comment, (Comment(post_id=rng.choice(post_ids),
+                                        author_id=rng.choice(users),
+                                        text=self.text(rng, 12),
+                                        created=pub_date())
+                                for _ in range(options['comments'])
+                                if post_ids))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей: {len(users)}, постов: {len(post_ids)}, '
+            f'картинок: {len(images)}'))
+        bump_generation()
+        for command in ('recount', 'rebuild_feeds', 'rebuild_search_index',
+                        'render_texts'):
+            call_command(command, stdout=self.stdout)
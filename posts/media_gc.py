@@ -0,0 +1,166 @@
+"""Сборка мусора в медиафайлах (команда `gc_media`).
+
+Обычно файл картинки освобождается сразу, когда на него перестают
+ссылаться посты (см. `posts.storage.release`), но файлы и записи kvstore
+sorl могли остаться от старых версий, упавших запросов или ручных правок
+базы. Сборщик проходит по ним партиями и сверяет с базой:
+
+* оригиналы в каталоге картинок постов - с `Post.image`;
+* записи kvstore о картинках постов - с `Post.image` (вместе с записью
+  удаляются миниатюры картинки);
+* файлы миниатюр - с записями kvstore.
+
+Каталоги читаются через `os.scandir` по одному, в памяти держится только
+текущая партия имён. Файлы моложе `min_age` секунд (и миниатюры таких
+картинок) не трогаются: их могли только что записать для поста, который
+ещё не закоммичен.
+"""
+import os
+import time
+from collections import Counter
+from itertools import islice
+
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as DBKVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .models import Post
+from .storage import image_storage, release
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def scan(storage, directory, min_age=0):
+    """Имена файлов хранилища под `directory` не моложе `min_age` секунд,
+    в порядке обхода каталогов."""
+    deadline = time.time() - min_age
+    location = storage.path('')
+    stack = [storage.path(directory)]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif (entry.is_file(follow_symlinks=False)
+                        and entry.stat().st_mtime <= deadline):
+                    yield os.path.relpath(entry.path, location).replace(
+                        os.sep, '/')
+
+
+def live_images(names):
+    return set(Post.objects.filter(image__in=names)
+               .values_list('image', flat=True))
+
+
+class Collector:
+    """Находит и (если не `dry_run`) удаляет мусор; `log(kind, name)`
+    вызывается для каждой найденной сироты."""
+
+    def __init__(self, dry_run=False, min_age=3600, batch_size=500,
+                 log=None):
+        self.dry_run = dry_run
+        self.min_age = min_age
+        self.batch_size = batch_size
+        self.log = log or (lambda kind, name: None)
+        self.directory = Post._meta.get_field('image').upload_to
+        self.found = Counter()
+
+    def run(self):
+        # записи kvstore - раньше миниатюр: их удаление освобождает
+        # файлы миниатюр, остальные сироты найдутся следующим шагом
+        self.collect_originals()
+        self.collect_kvstore()
+        self.collect_thumbnails()
+        return self.found
+
+    def orphan(self, kind, name):
+        self.found[kind] += 1
+        self.log(kind, name)
+
+    def collect_originals(self):
+        for batch in batches(scan(image_storage, self.directory,
+                                  self.min_age), self.batch_size):
+            live = live_images(batch)
+            for name in batch:
+                if name in live:
+                    continue
+                # release ещё раз проверяет ссылки: пост мог появиться
+                # после выборки
+                if self.dry_run or release(name):
+                    self.orphan('originals', name)
+
+    def is_recent(self, name):
+        try:
+            modified = os.path.getmtime(image_storage.path(name))
+        except OSError:
+            return False
+        return modified > time.time() - self.min_age
+
+    def image_entries(self):
+        """Записи kvstore о картинках постов (не миниатюрах) партиями."""
+        prefix = add_prefix('', 'image')
+        if not isinstance(default.kvstore, DBKVStore):
+            keys = default.kvstore._find_keys(identity='image')
+            entries = (default.kvstore._get(key) for key in keys)
+            yield from batches((image_file for image_file in entries
+                                if image_file is not None),
+                               self.batch_size)
+            return
+        last = prefix
+        while True:
+            rows = list(KVStoreModel.objects
+                        .filter(key__startswith=prefix, key__gt=last)
+                        .order_by('key').values_list('key', 'value')
+                        [:self.batch_size])
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield [deserialize_image_file(value) for _, value in rows]
+
+    def collect_kvstore(self):
+        for batch in self.image_entries():
+            batch = [image_file for image_file in batch
+                     if image_file.name.startswith(self.directory)]
+            live = live_images([image_file.name for image_file in batch])
+            for image_file in batch:
+                if image_file.name in live or self.is_recent(image_file.name):
+                    continue
+                if not self.dry_run:
+                    default.kvstore.delete(image_file)
+                self.orphan('kvstore', image_file.name)
+
+    def known_keys(self, keys):
+        if isinstance(default.kvstore, DBKVStore):
+            return set(KVStoreModel.objects.filter(key__in=keys)
+                       .values_list('key', flat=True))
+        return {key for key in keys
+                if default.kvstore._get_raw(key) is not None}
+
+    def collect_thumbnails(self):
+        storage = default.storage
+        directory = thumbnail_settings.THUMBNAIL_PREFIX
+        for batch in batches(scan(storage, directory, self.min_age),
+                             self.batch_size):
+            keys = {add_prefix(ImageFile(name, storage).key): name
+                    for name in batch}
+            known = self.known_keys(list(keys))
+            for key, name in keys.items():
+                if key in known:
+                    continue
+                if not self.dry_run:
+                    storage.delete(name)
+                self.orphan('thumbnails', name)
@@ -0,0 +1,273 @@
+"""Метрики запросов для продакшена.
+
+`MetricsMiddleware` считает для каждого view число запросов и время
+ответа, а для доли запросов `POSTS_METRICS_SAMPLE_RATE` ещё и число и
+время запросов к БД, время рендеринга шаблонов и попадания в кеш. Метрики
+отдаются в текстовом формате Prometheus на `/-/metrics/` (только по
+токену `POSTS_METRICS_TOKEN` и суперпользователям), а по замеренному
+запросу - ещё и в заголовке `Server-Timing`.
+
+Метрики хранятся в памяти процесса: при нескольких воркерах каждый
+отдаёт свои, их суммирует Prometheus.
+"""
+import hmac
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.template.backends.django import DjangoTemplates as BaseBackend
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CACHE_METHODS = ('get', 'get_many')
+
+_current = threading.local()
+_missing = object()
+
+
+class RequestMetrics:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.db_queries += 1
+
+    def server_timing(self, total):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} '
+            f'queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="hit={self.cache_hits} miss={self.cache_misses}"',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+
+class Registry:
+    """Накопленные метрики процесса по view."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = defaultdict(int)
+            self.buckets = defaultdict(lambda: [0] * len(DURATION_BUCKETS))
+            self.duration = defaultdict(float)
+            self.count = defaultdict(int)
+            self.sampled = defaultdict(int)
+            self.db_queries = defaultdict(int)
+            self.db_time = defaultdict(float)
+            self.template_time = defaultdict(float)
+            self.cache = defaultdict(int)
+
+    def record(self, view, method, status, duration, metrics=None):
+        with self._lock:
+            self.requests[view, method, status] += 1
+            self.count[view] += 1
+            self.duration[view] += duration
+            buckets = self.buckets[view]
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    buckets[index] += 1
+            if metrics is None:
+                return
+            self.sampled[view] += 1
+            self.db_queries[view] += metrics.db_queries
+            self.db_time[view] += metrics.db_time
+            self.template_time[view] += metrics.template_time
+            self.cache[view, 'hit'] += metrics.cache_hits
+            self.cache[view, 'miss'] += metrics.cache_misses
+
+    def render(self):
+        """Метрики в текстовом формате Prometheus."""
+        lines = []
+
+        def metric(name, kind, help_text, samples, suffix=''):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{_escape(value)}"'
+                                      for key, value in labels)
+                lines.append(f'{name}{suffix}{{{label_text}}} {value}')
+
+        with self._lock:
+            metric('yatube_requests_total', 'counter', 'Число запросов',
+                   [((('view', view), ('method', method),
+                      ('status', status)), count)
+                    for (view, method, status), count
+                    in sorted(self.requests.items())])
+            histogram = []
+            for view in sorted(self.count):
+                for bound, count in zip(DURATION_BUCKETS,
+                                        self.buckets[view]):
+                    histogram.append(((('view', view), ('le', bound)),
+                                      count))
+                histogram.append(((('view', view), ('le', '+Inf')),
+                                  self.count[view]))
+            metric('yatube_request_duration_seconds', 'histogram',
+                   'Время ответа', histogram, suffix='_bucket')
+            lines.extend(
+                f'yatube_request_duration_seconds_{suffix}'
+                f'{{view="{_escape(view)}"}} {values[view]}'
+                for view in sorted(self.count)
+                for suffix, values in (('sum', self.duration),
+                                       ('count', self.count)))
+            for name, help_text, values in (
+                    ('yatube_sampled_requests_total',
+                     'Число запросов с замерами БД, шаблонов и кеша',
+                     self.sampled),
+                    ('yatube_db_queries_total', 'Число запросов к БД',
+                     self.db_queries),
+                    ('yatube_db_duration_seconds_total',
+                     'Время запросов к БД', self.db_time),
+                    ('yatube_template_duration_seconds_total',
+                     'Время рендеринга шаблонов', self.template_time)):
+                metric(name, 'counter', help_text,
+                       [((('view', view),), value)
+                        for view, value in sorted(values.items())])
+            metric('yatube_cache_requests_total', 'counter',
+                   'Чтения из кеша по результату',
+                   [((('view', view), ('result', result)), count)
+                    for (view, result), count in sorted(self.cache.items())])
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"')
+
+
+registry = Registry()
+
+
+def _count_cache(cache, method, metrics):
+    original = getattr(cache, method)
+
+    if method == 'get':
+        def get(key, default=None, version=None):
+            value = original(key, _missing, version=version)
+            if value is _missing:
+                metrics.cache_misses += 1
+                return default
+            metrics.cache_hits += 1
+            return value
+        return get
+
+    def get_many(keys, version=None):
+        keys = list(keys)
+        found = original(keys, version=version)
+        metrics.cache_hits += len(found)
+        metrics.cache_misses += len(keys) - len(found)
+        return found
+    return get_many
+
+
+def _instrument_caches(stack, metrics):
+    """Подменяет чтение из кешей на время запроса. Объекты кешей у Django
+    свои в каждом потоке, поэтому подмена не задевает другие запросы."""
+    for alias in settings.CACHES:
+        cache = caches[alias]
+        for method in CACHE_METHODS:
+            setattr(cache, method, _count_cache(cache, method, metrics))
+            stack.callback(delattr, cache, method)
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.POSTS_METRICS_SAMPLE_RATE
+        self.server_timing = settings.POSTS_METRICS_SERVER_TIMING
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            response = self.get_response(request)
+            registry.record(_view_name(request), request.method,
+                            response.status_code,
+                            time.perf_counter() - started)
+            return response
+
+        metrics = RequestMetrics()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(
+                    metrics.execute))
+            _instrument_caches(stack, metrics)
+            _current.metrics = metrics
+            stack.callback(delattr, _current, 'metrics')
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        registry.record(_view_name(request), request.method,
+                        response.status_code, duration, metrics)
+        if self.server_timing:
+            response['Server-Timing'] = metrics.server_timing(duration)
+        return response
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unresolved'
+
+
+class TimedTemplate:
+    """Шаблон, который добавляет время рендеринга к замерам запроса."""
+
+    def __init__(self, template):
+        self._template = template
+
+    def __getattr__(self, name):
+        return getattr(self._template, name)
+
+    def render(self, context=None, request=None):
+        metrics = getattr(_current, 'metrics', None)
+        if metrics is None:
+            return self._template.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self._template.render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - started
+
+
+class DjangoTemplates(BaseBackend):
+    """Шаблонизатор Django с замером времени рендеринга."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+def _has_token(request):
+    token = settings.POSTS_METRICS_TOKEN
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(token) and hmac.compare_digest(header, f'Bearer {token}')
+
+
+def metrics_view(request):
+    """Метрики для Prometheus (`bearer_token` из `POSTS_METRICS_TOKEN`)
+    или для суперпользователя; остальным адрес выглядит несуществующим.
+
+    Адресу клиента не доверяем: за обратным прокси у всех запросов он
+    127.0.0.1."""
+    if not (_has_token(request) or request.user.is_superuser):
+        raise Http404
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4')
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.6 on 2026-10-18 19:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Выражение должно совпадать с SearchVector('text', config='russian')
+# из posts.search, иначе планировщик не использует индекс
+SEARCH_INDEX_SQL = (
+    "CREATE INDEX posts_post_text_search ON posts_post "
+    "USING gin (to_tsvector('russian'::regconfig, COALESCE((text)::text, '')))"
+)
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(SEARCH_INDEX_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS posts_post_text_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_post_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.Post')),
+            ],
+            options={
+                'unique_together': {('term', 'post')},
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 2.2.6 on 2026-10-18 20:45
+
+from django.db import migrations, models
+
+from posts import rendering
+
+
+def render_texts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    rendering.backfill(Post.objects.all(), rendering.render_post,
+                       rendering.POST_FIELDS)
+    rendering.backfill(Comment.objects.all(), rendering.render_comment,
+                       rendering.COMMENT_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='text_html',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='excerpt_html',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='truncated',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(render_texts, migrations.RunPython.noop),
+    ]
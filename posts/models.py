@@ -1,6 +1,10 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from .rendering import (
+    COMMENT_FIELDS, POST_FIELDS, render_comment, render_post)
+from .storage import image_storage
+
 User = get_user_model()
 
 
@@ -13,22 +17,93 @@ class Group(models.Model):
         return self.title
 
 
+# колонки поста, автора и группы, которые нужны карточке в лентах
+CARD_FIELDS = ('pub_date', 'updated', 'image', 'comment_count',
+               'excerpt_html', 'truncated',
+               'author__username', 'group__slug', 'group__title')
+
+
+class PostQuerySet(models.QuerySet):
+    def with_related(self):
+        """Пост с автором и группой одним запросом (число комментариев
+        хранится в самом посте)."""
+        return self.select_related('author', 'group')
+
+    def for_feed(self):
+        """Всё, что нужно карточке поста `post_item.html` в лентах, одним
+        запросом: только её колонки поста, автора и группы, а вместо
+        полного текста - готовый HTML его начала `excerpt_html`.
+
+        Полный текст грузит только страница поста (`with_related`)."""
+        return self.with_related().only(*CARD_FIELDS)
+
+
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField('date published', auto_now_add=True)
+    updated = models.DateTimeField('date updated', auto_now=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='posts')
     group = models.ForeignKey(Group, related_name='posts',
                               blank=True, null=True,
                               on_delete=models.SET_NULL)
-    image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    # одинаковые картинки хранятся один раз, см. posts.storage
+    image = models.ImageField(upload_to='posts/', storage=image_storage,
+                              blank=True, null=True, db_index=True)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    # HTML текста и его начала для лент, см. posts.rendering
+    text_html = models.TextField(default='', editable=False)
+    excerpt_html = models.TextField(default='', editable=False)
+    truncated = models.BooleanField(default=False, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
+        # индексы под сортировку лент (см. команду explain_feeds)
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text
 
+    @property
+    def card_html(self):
+        """HTML карточки: начало текста в лентах (`for_feed`), весь текст
+        там, где пост загружен целиком."""
+        if 'text_html' in self.get_deferred_fields():
+            return self.excerpt_html
+        return self.text_html
+
+    @property
+    def card_truncated(self):
+        """Карточка показывает не весь текст поста."""
+        return (self.truncated
+                and 'text_html' in self.get_deferred_fields())
+
+    def save(self, *args, **kwargs):
+        if 'text' not in self.get_deferred_fields():
+            render_post(self)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'text' in update_fields:
+                kwargs['update_fields'] = {*update_fields, *POST_FIELDS}
+        # comment_count меняется только атомарным UPDATE из posts.counters,
+        # сохранение загруженного поста не должно затирать его, а
+        # отложенные поля (см. `for_feed`) - подгружаться ради сохранения
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'comment_count'
+                and field.attname not in deferred]
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE,
@@ -36,8 +111,23 @@ class Comment(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='posts_comment')
     text = models.TextField()
+    text_html = models.TextField(default='', editable=False)
     created = models.DateTimeField('date published', auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if 'text' not in self.get_deferred_fields():
+            render_comment(self)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'text' in update_fields:
+                kwargs['update_fields'] = {*update_fields, *COMMENT_FIELDS}
+        super().save(*args, **kwargs)
+
 
 class Follow(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE,
@@ -47,3 +137,45 @@ class Follow(models.Model):
 
     class Meta:
         unique_together = ('user', 'author')
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, которые поддерживаются сигналами
+    (см. `posts.counters`), чтобы профиль не считал их запросами."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name='stats')
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+
+class FeedEntry(models.Model):
+    """Запись материализованной ленты подписок: пост автора, на которого
+    подписан пользователь. Заполняется при публикации поста (fan-out on
+    write), кроме авторов с огромным числом подписчиков - их посты лента
+    дочитывает при запросе."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='feed_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='feed_entries')
+    # копия post.pub_date: лента читается по индексу без сортировки постов
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='feed_user_pub_date_idx'),
+        ]
+
+
+class SearchTerm(models.Model):
+    """Обратный индекс для поиска по постам на базах без полнотекстового
+    поиска: основа слова, пост и сколько раз слово в нём встречается."""
+    term = models.CharField(max_length=64)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='search_terms')
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = ('term', 'post')
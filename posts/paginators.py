@@ -0,0 +1,159 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+
+class CursorPage:
+    """Страница курсорного паджинатора.
+
+    В отличие от `django.core.paginator.Page` ничего не знает об общем
+    количестве записей: только есть ли соседние страницы и их курсоры."""
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<CursorPage of %d items>' % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset-паджинатор: страница выбирается условием по ключу сортировки,
+    а не через OFFSET, поэтому глубокие страницы стоят столько же, сколько
+    первая, и не нужен COUNT(*).
+
+    Курсор - непрозрачная строка, в которой закодированы значения полей
+    `ordering` у граничной записи и направление перехода."""
+    cursor_based = True
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+
+    def encode_cursor(self, obj, direction):
+        values = []
+        for field in self.ordering:
+            value = getattr(obj, field.lstrip('-'))
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            values.append(value)
+        raw = json.dumps([direction, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Возвращает (direction, values) или None для битого курсора."""
+        if not cursor:
+            return None
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            raw = base64.urlsafe_b64decode(cursor + padding)
+            direction, values = json.loads(raw.decode())
+        except (ValueError, TypeError, binascii.Error):
+            return None
+        if direction not in ('next', 'prev') \
+                or not isinstance(values, list) \
+                or len(values) != len(self.ordering):
+            return None
+        return direction, values
+
+    def _keyset_filter(self, values, reverse):
+        """Условие "строго после" граничной записи в порядке `ordering`
+        (или "строго до", если reverse).
+
+        Для `('-pub_date', '-id')` это `pub_date <= v AND (pub_date < v OR
+        id < i)`, а не равносильное `pub_date < v OR (pub_date = v AND
+        id < i)`: по внешнему нестрогому условию база читает диапазон
+        индекса, а не проходит его целиком."""
+        condition = None
+        for field, value in reversed(list(zip(self.ordering, values))):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            strict = Q(**{'%s__%s' % (name, 'lt' if descending else 'gt'):
+                          value})
+            if condition is None:
+                condition = strict
+            else:
+                bound = Q(**{'%s__%s' % (name, 'lte' if descending else 'gte'):
+                             value})
+                condition = bound & (strict | condition)
+        return condition
+
+    def _reversed_ordering(self):
+        return [field[1:] if field.startswith('-') else '-' + field
+                for field in self.ordering]
+
+    def get_page(self, cursor=None):
+        """Как и `Paginator.get_page`, на некорректный курсор отдаёт
+        первую страницу, а не ошибку."""
+        decoded = self.decode_cursor(cursor)
+        queryset = self.object_list
+        if decoded is None:
+            direction, values = 'next', None
+        else:
+            direction, values = decoded
+        reverse = direction == 'prev'
+        if values is not None:
+            queryset = queryset.filter(self._keyset_filter(values, reverse))
+        if reverse:
+            queryset = queryset.order_by(*self._reversed_ordering())
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        items = list(queryset[:self.per_page + 1])
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if reverse:
+            items.reverse()
+
+        next_cursor = previous_cursor = None
+        if items:
+            if has_more or reverse:
+                next_cursor = self.encode_cursor(items[-1], 'next')
+            if (has_more and reverse) or (values is not None and not reverse):
+                previous_cursor = self.encode_cursor(items[0], 'prev')
+        return CursorPage(items, self, next_cursor, previous_cursor)
+
+
+def paginate(request, object_list, per_page=10,
+             ordering=('-pub_date', '-id'), count=None):
+    """Контекст паджинации для ленты: `page` и `paginator`.
+
+    Курсорная паджинация включается настройкой `POSTS_CURSOR_PAGINATION`
+    или параметром `?cursor=` в запросе, иначе используется обычный
+    `Paginator` с номерами страниц. Известное заранее число записей
+    (`count`, например из счётчиков) избавляет его от запроса COUNT."""
+    if getattr(settings, 'POSTS_CURSOR_PAGINATION', False) \
+            or 'cursor' in request.GET:
+        paginator = CursorPaginator(object_list, per_page, ordering)
+        page = paginator.get_page(request.GET.get('cursor'))
+    else:
+        paginator = Paginator(object_list, per_page)
+        if count is not None:
+            paginator.count = count
+        page = paginator.get_page(request.GET.get('page'))
+    return {'page': page, 'paginator': paginator}
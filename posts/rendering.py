@@ -0,0 +1,58 @@
+"""Готовый HTML текста постов и комментариев.
+
+Текст экранируется, а переносы строк превращаются в `<br>` (как фильтром
+`linebreaksbr`) один раз - при сохранении поста или комментария, а не при
+каждом показе: шаблоны выводят `text_html` и `excerpt_html` как есть.
+Строки, записанные в обход `save()` (`bulk_create` в `seed_yatube`),
+дорисовывает команда `render_texts`; `import_yatube` отрисовывает каждую
+загружаемую пачку сам.
+"""
+from django.template.defaultfilters import linebreaksbr
+
+# сколько символов текста поста показывает карточка в лентах
+EXCERPT_LENGTH = 500
+POST_FIELDS = ('text_html', 'excerpt_html', 'truncated')
+COMMENT_FIELDS = ('text_html',)
+
+
+def render_text(text):
+    return linebreaksbr(text, autoescape=True)
+
+
+def render_post(post):
+    post.text_html = render_text(post.text)
+    post.truncated = len(post.text) > EXCERPT_LENGTH
+    post.excerpt_html = (render_text(post.text[:EXCERPT_LENGTH])
+                         if post.truncated else post.text_html)
+
+
+def render_comment(comment):
+    comment.text_html = render_text(comment.text)
+
+
+def backfill(queryset, render, fields, everything=False, batch_size=500):
+    """Дорисовывает HTML строкам `queryset` пачками по первичному ключу:
+    только тем, где его нет, или всем (`everything`), если поменялись
+    правила отрисовки. Записываются только изменившиеся строки; возвращает
+    их число."""
+    if not everything:
+        queryset = queryset.filter(text_html='').exclude(text='')
+    queryset = queryset.only('pk', 'text', *fields).order_by('pk')
+    manager = queryset.model._base_manager
+    last = None
+    updated = 0
+    while True:
+        page = queryset if last is None else queryset.filter(pk__gt=last)
+        batch = list(page[:batch_size])
+        if not batch:
+            return updated
+        changed = []
+        for obj in batch:
+            before = [getattr(obj, field) for field in fields]
+            render(obj)
+            if [getattr(obj, field) for field in fields] != before:
+                changed.append(obj)
+        if changed:
+            manager.bulk_update(changed, fields)
+        updated += len(changed)
+        last = batch[-1].pk
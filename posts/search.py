@@ -0,0 +1,124 @@
+"""Полнотекстовый поиск по постам.
+
+На PostgreSQL используется встроенный полнотекстовый поиск со словарём
+`russian` и GIN-индексом (см. миграцию 0010). На остальных базах посты
+индексируются в таблицу `SearchTerm` - обратный индекс из основ слов,
+полученных стеммером Портера для русского языка (Snowball).
+"""
+import re
+from collections import Counter
+
+from django.db import connection
+from django.db.models import Count, Sum
+
+from .models import Post, SearchTerm
+
+SEARCH_CONFIG = 'russian'
+MAX_TERM_LENGTH = 64
+
+RV = re.compile(r'^(.*?[аеиоуыэюя])(.*)$')
+PERFECTIVE_GERUND = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$')
+REFLEXIVE = re.compile(r'(с[яь])$')
+ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|'
+    r'ую|юю|ая|яя|ою|ею)$')
+PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|ено|'
+    r'ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)|'
+    r'((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$')
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|'
+    r'ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$')
+DERIVATIONAL_REGION = re.compile(r'.*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$')
+DERIVATIONAL = re.compile(r'ость?$')
+SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+WORD = re.compile(r'\w+')
+# самые частые служебные слова, как в словаре `russian` PostgreSQL
+STOP_WORDS = frozenset('''
+    а без более бы был была были было быть в вам вас весь во вот все всего
+    всех вы где да даже для до его ее если есть еще же за здесь и из или им
+    их к как ко когда кто ли либо мне может мы на надо наш не него нее нет
+    ни них но ну о об однако он она они оно от очень по под при с со так
+    также такой там те тем то того тоже той только том ты у уже хотя чего
+    чей чем что чтобы чье чья эта эти это я
+'''.split())
+
+
+def stem(word):
+    """Основа слова по алгоритму Портера для русского языка."""
+    word = word.lower().replace('ё', 'е')
+    match = RV.match(word)
+    if match is None:
+        return word
+    prefix, rv = match.groups()
+
+    step = PERFECTIVE_GERUND.sub('', rv, 1)
+    if step == rv:
+        rv = REFLEXIVE.sub('', rv, 1)
+        step = ADJECTIVE.sub('', rv, 1)
+        if step != rv:
+            rv = PARTICIPLE.sub('', step, 1)
+        else:
+            step = VERB.sub('', rv, 1)
+            rv = NOUN.sub('', rv, 1) if step == rv else step
+    else:
+        rv = step
+
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    if DERIVATIONAL_REGION.match(rv):
+        rv = DERIVATIONAL.sub('', rv, 1)
+    if rv.endswith('ь'):
+        rv = rv[:-1]
+    else:
+        rv = SUPERLATIVE.sub('', rv, 1)
+        if rv.endswith('нн'):
+            rv = rv[:-1]
+    return prefix + rv
+
+
+def terms(text):
+    """Основы значимых слов текста в порядке появления."""
+    words = WORD.findall(text.lower().replace('ё', 'е'))
+    return [stem(word)[:MAX_TERM_LENGTH]
+            for word in words if word not in STOP_WORDS]
+
+
+def uses_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def index_post(post):
+    """Обновляет обратный индекс поста (на PostgreSQL не нужен)."""
+    if uses_postgres():
+        return
+    SearchTerm.objects.filter(post=post).delete()
+    SearchTerm.objects.bulk_create(
+        SearchTerm(post=post, term=term, weight=weight)
+        for term, weight in Counter(terms(post.text)).items())
+
+
+def search_posts(query):
+    """Посты, содержащие все слова запроса, с релевантностью `rank`."""
+    if not query.strip():
+        return Post.objects.none()
+    if uses_postgres():
+        from django.contrib.postgres.search import (
+            SearchQuery, SearchRank, SearchVector)
+        vector = SearchVector('text', config=SEARCH_CONFIG)
+        search_query = SearchQuery(query, config=SEARCH_CONFIG)
+        return (Post.objects.for_feed()
+                .annotate(search=vector,
+                          rank=SearchRank(vector, search_query))
+                .filter(search=search_query))
+
+    query_terms = set(terms(query))
+    if not query_terms:
+        return Post.objects.none()
+    return (Post.objects.for_feed()
+            .filter(search_terms__term__in=query_terms)
+            .annotate(matched=Count('search_terms__term', distinct=True),
+                      rank=Sum('search_terms__weight'))
+            .filter(matched=len(query_terms)))
@@ -0,0 +1,96 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import counters, feeds, follows, search, storage
+from .cache import bump_generation
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_user(instance.author_id, 'posts_count', 1)
+        feeds.fan_out_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, **kwargs):
+    search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, 'posts_count', -1)
+    release_image(instance.image.name)
+
+
+def release_image(name):
+    """Файл картинки освобождается после коммита, когда ссылки на него из
+    этой транзакции уже не видны."""
+    if name:
+        transaction.on_commit(lambda: storage.release(name))
+
+
+@receiver(pre_save, sender=Post)
+def post_image_remembered(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding or (update_fields is not None
+                                  and 'image' not in update_fields):
+        return
+    instance._previous_image = (
+        Post.objects.filter(pk=instance.pk)
+        .values_list('image', flat=True).first())
+
+
+@receiver(post_save, sender=Post)
+def post_image_claimed(sender, instance, **kwargs):
+    # пост закоммичен и сам держит файл - заявка загрузки больше не нужна
+    for name in storage.take_claims():
+        transaction.on_commit(lambda name=name: storage.unclaim(name))
+
+
+@receiver(post_save, sender=Post)
+def post_image_replaced(sender, instance, **kwargs):
+    previous = instance.__dict__.pop('_previous_image', None)
+    if previous and previous != instance.image.name:
+        release_image(previous)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.bump_comments(instance.post_id, -1)
+    # Last-Modified поста в API (см. posts.api.post_version)
+    bump_generation(f'comments:{instance.post_id}')
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        follows.followed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    follows.unfollowed(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def content_changed(sender, **kwargs):
+    bump_generation()
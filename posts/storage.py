@@ -0,0 +1,190 @@
+"""Хранилище картинок постов с адресацией по содержимому.
+
+Файл сохраняется под именем из sha256 своего содержимого
+(`posts/3f/3fa2….jpg`), поэтому одинаковые картинки разных постов лежат
+на диске один раз, и миниатюры sorl у них тоже общие. Хеш загрузки уже
+посчитан при приёме (`posts.uploads.ImageUploadHandler`), остальные файлы
+хешируются по кускам.
+
+Число ссылок на файл - число постов с таким `Post.image`. Когда пост
+удаляют или меняют ему картинку, `release` удаляет файл, его миниатюры и
+записи kvstore, если на файл больше никто не ссылается (см.
+`posts.signals`).
+
+Загрузка, которая нашла готовый файл, ничего не пишет, и её пост ещё не
+закоммичен - `release` этой ссылки не видит. Поэтому такая загрузка
+оставляет на файле заявку (счётчик в кеше, `claim`), которую снимает
+коммит поста (`unclaim`), а `release` файл с заявками не трогает. Проверка
+существования файла, заявка, переименование готовой копии на место и
+удаление идут под межпроцессной блокировкой `ContentAddressedStorage.lock`;
+сама копия пишется во временный файл рядом без неё. Заявка
+незакоммиченного поста истекает через `CLAIM_SECONDS`, и файл потом
+соберёт `gc_media`.
+"""
+import fcntl
+import hashlib
+import logging
+import os
+import posixpath
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+from sorl.thumbnail import delete as delete_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+logger = logging.getLogger(__name__)
+
+# сколько живёт заявка на файл, если пост так и не закоммитили
+CLAIM_SECONDS = 60 * 60
+# заявки текущего потока, которые снимет коммит сохраняемого поста
+_claims = threading.local()
+
+
+def content_hash(content):
+    """sha256 содержимого файла в hex."""
+    digest = getattr(content, 'sha256', None)
+    if digest:
+        return digest
+    sha256 = hashlib.sha256()
+    for chunk in content.chunks():
+        sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """`FileSystemStorage`, который называет файлы по хешу содержимого.
+
+    Если такой файл уже есть, он не перезаписывается: `save` оставляет на
+    нём заявку и просто возвращает его имя."""
+
+    @contextmanager
+    def lock(self):
+        """Блокировка между процессами вокруг проверки, заявки и удаления
+        файлов; файл блокировки лежит вне MEDIA_ROOT."""
+        location = hashlib.sha1(self.location.encode()).hexdigest()[:12]
+        path = os.path.join(tempfile.gettempdir(),
+                            f'yatube-images-{location}.lock')
+        with open(path, 'a') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def hashed_name(self, name, digest):
+        directory = posixpath.dirname(name)
+        extension = posixpath.splitext(name)[1].lower()
+        return posixpath.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content_hash(content))
+        with self.lock():
+            if self.exists(name):
+                claim(name)
+                return name
+        temp_path = self._write_temp(name, content)
+        try:
+            with self.lock():
+                # пока писалась копия, тот же файл мог сохранить другой
+                # процесс
+                if self.exists(name):
+                    claim(name)
+                else:
+                    os.replace(temp_path, self.path(name))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return name
+
+    def _write_temp(self, name, content):
+        """Копия содержимого во временный файл в каталоге `name`: на той же
+        файловой системе `os.replace` атомарен."""
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        temp_path = os.path.join(
+            directory, f'.{os.path.basename(path)}.{uuid.uuid4().hex}.tmp')
+        # права как у FileSystemStorage._save: 0o666 с учётом umask
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                for chunk in content.chunks():
+                    file.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return temp_path
+
+
+image_storage = ContentAddressedStorage()
+
+
+def image_file(name):
+    """Картинка поста для sorl: ключи kvstore зависят от хранилища, поэтому
+    миниатюры создаются и удаляются через то же хранилище, что у
+    `Post.image`."""
+    return ImageFile(name, image_storage)
+
+
+def _claim_key(name):
+    return f'image-claim:{name}'
+
+
+def claim(name):
+    """Заявка на существующий файл от загрузки, чей пост ещё не
+    закоммичен. Вызывается под `lock`."""
+    key = _claim_key(name)
+    cache.set(key, (cache.get(key) or 0) + 1, CLAIM_SECONDS)
+    if not hasattr(_claims, 'names'):
+        _claims.names = []
+    _claims.names.append(name)
+
+
+def take_claims():
+    """Заявки, оставленные текущим потоком с прошлого вызова."""
+    names = getattr(_claims, 'names', [])
+    _claims.names = []
+    return names
+
+
+def unclaim(name):
+    """Снимает заявку после коммита поста, который ссылается на файл."""
+    key = _claim_key(name)
+    with image_storage.lock():
+        count = (cache.get(key) or 0) - 1
+        if count > 0:
+            cache.set(key, count, CLAIM_SECONDS)
+        else:
+            cache.delete(key)
+
+
+def release(name):
+    """Удаляет файл, его миниатюры и записи kvstore, если на файл больше
+    не ссылается ни один пост и нет заявок. Возвращает True, если файл
+    удалён."""
+    from .models import Post
+    if not name:
+        return False
+    with image_storage.lock():
+        if (cache.get(_claim_key(name))
+                or Post.objects.filter(image=name).exists()):
+            return False
+        try:
+            delete_thumbnails(image_file(name))
+        except Exception:
+            logger.exception('Не удалось удалить картинку %s', name)
+            return False
+    return True
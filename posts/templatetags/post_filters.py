@@ -0,0 +1,9 @@
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def authored_by(post, user):
+    """Является ли пользователь автором поста, без загрузки автора."""
+    return user.is_authenticated and post.author_id == user.pk
@@ -0,0 +1,46 @@
+import logging
+
+from django import template
+from posts.thumbnails import (
+    CARD_FORMATS, CARD_SIZES, cached_thumbnail, card_variants)
+
+register = template.Library()
+logger = logging.getLogger(__name__)
+
+MIME_TYPES = {
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+}
+
+
+@register.inclusion_tag('posts/picture.html')
+def post_picture(image):
+    """<picture> со srcset из вариантов `posts.thumbnails.card_variants`.
+
+    В srcset попадают только готовые миниатюры: создаёт их фоновый пул
+    (`posts.thumbnails.queue_thumbnails`), а не просмотр страницы. Пока
+    нет запасного варианта для <img>, показывается исходная картинка."""
+    if not image:
+        return {}
+    sources = []
+    try:
+        for format_ in CARD_FORMATS:
+            srcset = []
+            thumbnail = None
+            for width, geometry, options in card_variants(format_):
+                cached = cached_thumbnail(image, geometry, **options)
+                if cached is not None:
+                    thumbnail = cached
+                    srcset.append(f'{thumbnail.url} {width}w')
+            sources.append({'type': MIME_TYPES[format_],
+                            'srcset': ', '.join(srcset),
+                            'thumbnail': thumbnail})
+    except Exception:
+        # как и {% thumbnail %}, битая картинка не должна ронять страницу
+        logger.exception('Не удалось подготовить картинку %s', image)
+        return {}
+    fallback = sources.pop()
+    if fallback['thumbnail'] is None:
+        return {'original': image}
+    return {'sources': [source for source in sources if source['srcset']],
+            'fallback': fallback, 'sizes': CARD_SIZES}
@@ -78,6 +78,15 @@ class CacheCaseTest(TestCase):
     def test_cache_index(self):
         """Тестирование функции кэша"""
         cache.clear()
+        self.post = Post.objects.create(text="Test post", author=self.user)
+        self.client.get(self.reverse_index)
+        Post.objects.filter(pk=self.post.pk).update(text="Not invalidated")
+        response = self.client.get(self.reverse_index)
+        self.assertNotContains(response, "Not invalidated")
+
+    def test_cache_index_invalidation(self):
+        """Кэш главной страницы сбрасывается при изменении поста"""
+        cache.clear()
         self.client.get(self.reverse_index)
         self.post = Post.objects.create(text="Test post", author=self.user)
         self.new_text = "New Test"
@@ -85,7 +94,7 @@ class CacheCaseTest(TestCase):
                                                    self.post.id]),
                                                    {'text': self.new_text})
         response = self.client.get(self.reverse_index)
-        self.assertNotContains(response, self.new_text)
+        self.assertContains(response, self.new_text)
 
 
 class FollowCaseTests(TestCase):
@@ -108,13 +117,13 @@ class FollowCaseTests(TestCase):
         """Авторизованный пользователь может подписываться на других пользователей"""
         self.client.get(reverse('profile_follow', args=[self.user2]))
         response = self.client.get(reverse('profile', args=[self.user]))
-        self.assertEqual(response.context["followed"], 1)
+        self.assertEqual(response.context["stats"].following_count, 1)
 
     def test_unfollow(self):
         """Авторизованный пользователь может удалять других пользователей из подписок."""
         self.client.get(reverse('profile_unfollow', args=[self.user2]))
         response = self.client.get(reverse('profile', args=[self.user]))
-        self.assertEqual(response.context["followed"], 0)
+        self.assertEqual(response.context["stats"].following_count, 0)
 
     def test_news_lent(self):
         """Новая запись пользователя появляется в ленте тех, кто на него подписан"""
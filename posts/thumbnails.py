@@ -0,0 +1,111 @@
+"""Фоновая подготовка миниатюр картинок постов.
+
+Миниатюры, которые показывают шаблоны, перечислены в `THUMBNAILS` и
+создаются заранее в пуле потоков после сохранения поста, чтобы первый
+просмотр не платил за декодирование и масштабирование картинки. Шаблоны
+сами миниатюры не создают, а только ищут готовые (`cached_thumbnail`).
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as thumbnail_defaults
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from .storage import image_file
+
+logger = logging.getLogger(__name__)
+
+# Карточка поста отдаёт картинку 960x339 в нескольких ширинах и форматах:
+# браузер сам выбирает наименьший подходящий вариант из srcset.
+# Последний формат - запасной для <img> в браузерах без WebP.
+CARD_SIZE = (960, 339)
+CARD_WIDTHS = (320, 640, 960)
+CARD_FORMATS = ('WEBP', 'JPEG')
+CARD_SIZES = '(max-width: 960px) 100vw, 960px'
+
+
+def card_variants(format_):
+    """(ширина, геометрия, опции sorl) для каждой ширины карточки."""
+    width, height = CARD_SIZE
+    for variant_width in CARD_WIDTHS:
+        variant_height = round(variant_width * height / width)
+        yield (variant_width, f'{variant_width}x{variant_height}',
+               {'crop': 'center', 'upscale': True, 'format': format_})
+
+
+# (геометрия, опции) - все миниатюры, которые показывают шаблоны
+THUMBNAILS = [(geometry, options)
+              for format_ in CARD_FORMATS
+              for _, geometry, options in card_variants(format_)]
+
+_executor = None
+
+
+def cached_thumbnail(file_, geometry, **options):
+    """Готовая миниатюра из kvstore sorl или None, если её ещё нет.
+
+    Имя миниатюры строится так же, как в `get_thumbnail`, но картинка не
+    открывается и ничего не создаётся."""
+    backend = default.backend
+    source = ImageFile(file_)
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(thumbnail_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return default.kvstore.get(ImageFile(name, default.storage))
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.POSTS_THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails')
+    return _executor
+
+
+def render_thumbnails(name):
+    """Создаёт все миниатюры картинки; уже созданные sorl берёт из kvstore.
+    Возвращает число успешно подготовленных миниатюр."""
+    rendered = 0
+    for geometry, options in THUMBNAILS:
+        try:
+            get_thumbnail(image_file(name), geometry, **options)
+        except Exception:
+            logger.exception('Не удалось создать миниатюру %s для %s',
+                             geometry, name)
+        else:
+            rendered += 1
+    return rendered
+
+
+def _render_in_thread(name):
+    try:
+        render_thumbnails(name)
+    finally:
+        connections.close_all()
+
+
+def queue_thumbnails(post):
+    """Ставит миниатюры картинки поста в очередь после коммита.
+
+    При `POSTS_THUMBNAIL_WORKERS = 0` миниатюры создаются сразу в запросе."""
+    if not post.image:
+        return
+    name = post.image.name
+
+    def submit():
+        if settings.POSTS_THUMBNAIL_WORKERS:
+            _get_executor().submit(_render_in_thread, name)
+        else:
+            render_thumbnails(name)
+    transaction.on_commit(submit)
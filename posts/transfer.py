@@ -0,0 +1,312 @@
+"""Потоковый перенос данных между базами (команды `export_yatube` и
+`import_yatube`).
+
+Формат - JSON Lines: одна запись на строку, поля как у сериализатора
+`python` из Django (`{"model": ..., "pk": ..., "fields": {...}}`). Записи
+идут по моделям в порядке зависимостей, поэтому файл читается построчно и
+никогда не держится в памяти целиком. Производные данные (счётчики, ленты
+подписок, поисковый индекс, готовый HTML текста) не выгружаются, а при
+импорте отбрасываются, даже если они есть в файле: HTML текста считается
+заново при загрузке пачки, остальное пересчитывается командами `recount`,
+`rebuild_feeds` и `rebuild_search_index`.
+"""
+import gzip
+import json
+import os
+import shutil
+from collections import Counter
+from concurrent.futures import (
+    ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait)
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from django.core import serializers
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models.fields.files import FieldFile
+
+from .models import Comment, Follow, Group, Post, User
+from .rendering import (
+    COMMENT_FIELDS, POST_FIELDS, render_comment, render_post)
+
+# (модель, уровень зависимости): модели одного уровня не ссылаются друг
+# на друга и загружаются параллельно
+MODELS = [
+    (User, 0),
+    (Group, 0),
+    (Post, 1),
+    (Comment, 2),
+    (Follow, 2),
+]
+# пересчитываются после импорта
+EXCLUDED_FIELDS = {
+    Post: {'comment_count', *POST_FIELDS},
+    Comment: set(COMMENT_FIELDS),
+}
+# HTML текста из выгрузки не может попасть в базу: он выводится без
+# экранирования
+RENDER = {
+    Post: render_post,
+    Comment: render_comment,
+}
+LEVELS = {model._meta.label_lower: level for model, level in MODELS}
+BY_LABEL = {model._meta.label_lower: model for model, _ in MODELS}
+
+
+def open_dump(path, mode):
+    """Файл выгрузки; `-` - stdin/stdout, `.gz` - со сжатием."""
+    if path == '-':
+        return None
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def export_fields(model):
+    excluded = EXCLUDED_FIELDS.get(model, set())
+    return [field for field in model._meta.concrete_fields
+            if not field.primary_key and field.name not in excluded]
+
+
+def _value(obj, field):
+    value = getattr(obj, field.attname)
+    if isinstance(value, FieldFile):
+        return value.name or None
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def copy_image(name, source, target):
+    """Копирует файл картинки потоком, не читая его в память целиком."""
+    with source.open(name, 'rb') as src:
+        if target.exists(name):
+            return
+        target.save(name, File(src, name=name))
+
+
+class DirectoryStorage:
+    """Каталог с картинками рядом с выгрузкой - с тем же интерфейсом
+    `open/exists/save`, что и у хранилища Django."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _path(self, name):
+        return os.path.join(self.path, name)
+
+    def open(self, name, mode='rb'):
+        return open(self._path(name), mode)
+
+    def exists(self, name):
+        return os.path.exists(self._path(name))
+
+    def save(self, name, content):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as dst:
+            shutil.copyfileobj(content, dst)
+        return name
+
+
+def export_records(out, batch_size=1000, media_dir=None):
+    """Пишет все записи в `out`, возвращает число записей по моделям.
+
+    С `media_dir` картинки постов копируются в этот каталог."""
+    counts = Counter()
+    media = DirectoryStorage(media_dir) if media_dir else None
+    missing = 0
+    for model, _ in MODELS:
+        label = model._meta.label_lower
+        fields = export_fields(model)
+        queryset = model._default_manager.order_by('pk')
+        for obj in queryset.iterator(chunk_size=batch_size):
+            record = {'model': label, 'pk': obj.pk,
+                      'fields': {field.name: _value(obj, field)
+                                 for field in fields}}
+            out.write(json.dumps(record, ensure_ascii=False))
+            out.write('\n')
+            counts[label] += 1
+            image = record['fields'].get('image')
+            if media and image:
+                try:
+                    copy_image(image, default_storage, media)
+                except FileNotFoundError:
+                    missing += 1
+    return counts, missing
+
+
+@contextmanager
+def preserve_timestamps():
+    """Отключает auto_now/auto_now_add, чтобы `bulk_create` сохранил даты
+    из выгрузки, а не текущее время."""
+    fields = [field for model, _ in MODELS
+              for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False)
+              or getattr(field, 'auto_now_add', False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+class Checkpoint:
+    """Номер последней строки, до которой включительно всё загружено.
+
+    Пачки в пуле завершаются не по порядку, поэтому отметка сдвигается
+    только по непрерывному префиксу завершённых пачек."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.line = 0
+        self._finished = {}
+        if path and os.path.exists(path):
+            with open(path) as file:
+                self.line = json.load(file)['line']
+
+    def done(self, first, last):
+        self._finished[first] = last
+        advanced = False
+        while self.line + 1 in self._finished:
+            self.line = self._finished.pop(self.line + 1)
+            advanced = True
+        if advanced and self.path:
+            tmp = f'{self.path}.tmp'
+            with open(tmp, 'w') as file:
+                json.dump({'line': self.line}, file)
+            os.replace(tmp, self.path)
+
+    def remove(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def import_batch(label, records, media_dir=None):
+    model = BY_LABEL[label]
+    excluded = EXCLUDED_FIELDS.get(model, set())
+    for record in records:
+        for name in excluded:
+            record['fields'].pop(name, None)
+    objects = [item.object for item in serializers.deserialize(
+        'python', records, ignorenonexistent=True)]
+    render = RENDER.get(model)
+    if render:
+        for obj in objects:
+            render(obj)
+    if media_dir:
+        media = DirectoryStorage(media_dir)
+        for record in records:
+            image = record['fields'].get('image')
+            if image and media.exists(image):
+                copy_image(image, media, default_storage)
+    # повторная загрузка пачки после прерванного импорта не должна падать
+    with transaction.atomic():
+        model._default_manager.bulk_create(objects, ignore_conflicts=True)
+    return len(objects)
+
+
+def _import_in_thread(label, records, media_dir):
+    try:
+        return import_batch(label, records, media_dir)
+    finally:
+        connections.close_all()
+
+
+class Importer:
+    """Читает записи построчно и загружает их пачками по `batch_size`.
+
+    При `workers > 0` пачки загружаются в пуле потоков: пачки одной модели
+    и моделей одного уровня - параллельно, перед следующим уровнем
+    дожидаемся завершения предыдущего."""
+
+    def __init__(self, batch_size=1000, workers=0, checkpoint=None,
+                 media_dir=None):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.checkpoint = checkpoint or Checkpoint()
+        self.media_dir = media_dir
+        self.counts = Counter()
+        self._pending = {}
+        self._level = 0
+
+    def _collect(self, futures):
+        for future in futures:
+            label, first, last = self._pending.pop(future)
+            self.counts[label] += future.result()
+            self.checkpoint.done(first, last)
+
+    def _wait(self, return_when):
+        done, _ = wait(self._pending, return_when=return_when)
+        self._collect(done)
+
+    def _submit(self, executor, label, records, first, last):
+        level = LEVELS[label]
+        if level != self._level:
+            # записи следующего уровня ссылаются на уже загруженные
+            if self._pending:
+                self._wait(ALL_COMPLETED)
+            self._level = level
+        if executor is None:
+            self.counts[label] += import_batch(label, records,
+                                               self.media_dir)
+            self.checkpoint.done(first, last)
+            return
+        if len(self._pending) >= self.workers * 2:
+            self._wait(FIRST_COMPLETED)
+        future = executor.submit(_import_in_thread, label, records,
+                                 self.media_dir)
+        self._pending[future] = (label, first, last)
+
+    def run(self, lines):
+        executor = (ThreadPoolExecutor(max_workers=self.workers,
+                                       thread_name_prefix='import')
+                    if self.workers else None)
+        label, records = None, []
+        first = last = self.checkpoint.line + 1
+        try:
+            with preserve_timestamps():
+                for number, line in enumerate(lines, 1):
+                    if number <= self.checkpoint.line:
+                        continue
+                    line = line.strip()
+                    if not line:
+                        continue
+                    record = json.loads(line)
+                    if records and (record['model'] != label
+                                    or len(records) >= self.batch_size):
+                        self._submit(executor, label, records, first,
+                                     number - 1)
+                        records, first = [], number
+                    label = record['model']
+                    if label not in BY_LABEL:
+                        raise ValueError(
+                            f'Строка {number}: неизвестная модель {label}')
+                    records.append(record)
+                    last = number
+                if records:
+                    self._submit(executor, label, records, first, last)
+                if self._pending:
+                    self._wait(ALL_COMPLETED)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        reset_sequences()
+        return self.counts
+
+
+def reset_sequences():
+    """После вставки с явными pk последовательности (PostgreSQL) нужно
+    сдвинуть за максимальный id, как это делает `loaddata`."""
+    statements = connection.ops.sequence_reset_sql(
+        no_style(), [model for model, _ in MODELS])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
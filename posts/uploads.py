@@ -0,0 +1,138 @@
+"""Потоковый приём картинок постов.
+
+`ImageUploadHandler` (его ставит на view декоратор `accept_images`, у
+остальных view обработчики Django по умолчанию) пишет загрузку во
+временный файл по кускам, по пути считает sha256 и разбирает заголовок
+картинки. Слишком большой файл или картинка со слишком большими размерами
+отклоняется, как только это становится известно: остаток файла
+пропускается без записи на диск, а поля формы после него разбираются как
+обычно. Причина отказа сохраняется в `request.upload_errors` и
+показывается в форме (см. `PostForm`).
+
+Запрос, который по Content-Length заведомо больше допустимого, отклоняется
+ответом 413 ещё до чтения тела: без тела нельзя ни проверить CSRF, ни
+показать форму.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import NON_FIELD_ERRORS
+from django.core.files.uploadhandler import (
+    SkipFile, StopFutureHandlers, StopUpload, TemporaryFileUploadHandler)
+from django.http import HttpResponse
+from django.template.defaultfilters import filesizeformat
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image, ImageFile
+
+# Сколько байт от начала файла можно прочитать в поисках размеров
+# картинки: заголовок JPEG с EXIF редко больше 64 КБ
+MAX_HEADER_SIZE = 512 * 1024
+
+
+def upload_errors(request):
+    """Ошибки загрузки файлов запроса по именам полей."""
+    return getattr(request, 'upload_errors', {})
+
+
+def accept_images(view):
+    """Файлы запроса к `view` принимает `ImageUploadHandler`.
+
+    Обработчики можно заменить только до чтения тела запроса, а его читает
+    проверка CSRF, поэтому она выполняется уже внутри (как советует
+    документация Django)."""
+    protected = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers = [ImageUploadHandler(request)]
+        try:
+            return protected(request, *args, **kwargs)
+        except StopUpload:
+            message = upload_errors(request).get(NON_FIELD_ERRORS, '')
+            return HttpResponse(message, status=413,
+                                content_type='text/plain; charset=utf-8')
+    return wrapper
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """Загрузка картинки с ранней проверкой размера и заголовка."""
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        # кроме файла в теле только поля формы, а их Django и так не
+        # принимает больше DATA_UPLOAD_MAX_MEMORY_SIZE
+        fields_size = settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+        if fields_size is None:
+            return None
+        if content_length <= settings.POSTS_UPLOAD_MAX_SIZE + fields_size:
+            return None
+        errors = self.request.__dict__.setdefault('upload_errors', {})
+        errors[NON_FIELD_ERRORS] = (
+            'Файл больше %s.' % filesizeformat(settings.POSTS_UPLOAD_MAX_SIZE))
+        # тело не дочитывается
+        raise StopUpload(connection_reset=True)
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.parser = ImageFile.Parser()
+        self.image_size = None
+        self.image_format = None
+        # файл целиком обрабатывает этот обработчик
+        raise StopFutureHandlers()
+
+    def error(self, message):
+        errors = self.request.__dict__.setdefault('upload_errors', {})
+        errors[self.field_name] = message
+
+    def reject(self, message):
+        self.error(message)
+        raise SkipFile()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > settings.POSTS_UPLOAD_MAX_SIZE:
+            self.reject('Файл больше %s.'
+                        % filesizeformat(settings.POSTS_UPLOAD_MAX_SIZE))
+        if self.image_size is None:
+            self.read_header(raw_data)
+        self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def read_header(self, raw_data):
+        try:
+            self.parser.feed(raw_data)
+        except Image.DecompressionBombError:
+            self.reject('Слишком большая картинка.')
+        except Exception:
+            self.reject('Загрузите правильное изображение. Файл, который '
+                        'вы загрузили, поврежден или не является '
+                        'изображением.')
+        image = self.parser.image
+        if image is None:
+            if self.size > MAX_HEADER_SIZE:
+                self.reject('Не удалось прочитать размеры картинки.')
+            return
+        width, height = image.size
+        if width * height > settings.POSTS_UPLOAD_MAX_PIXELS:
+            self.reject(f'Слишком большая картинка: {width}x{height}.')
+        self.image_size = image.size
+        self.image_format = image.format
+        # дальше картинку не декодируем
+        self.parser = None
+
+    def file_complete(self, file_size):
+        if self.image_size is None:
+            self.error('Загрузите правильное изображение. Файл, который '
+                       'вы загрузили, поврежден или не является '
+                       'изображением.')
+            self.file.close()
+            return None
+        file = super().file_complete(file_size)
+        file.sha256 = self.sha256.hexdigest()
+        file.image_size = self.image_size
+        file.image_format = self.image_format
+        return file
@@ -1,88 +1,157 @@
+from urllib.parse import urlencode
+
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
+from django.template.loader import render_to_string
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-from django.views.decorators.cache import cache_page
 
+from . import follows
 from .models import Post, Group, User, Comment, Follow
+from .cache import cache_page_versioned
+from .counters import get_stats
+from .db import pin_to_primary
+from .feeds import FEED_ORDERING, follow_feed
 from .forms import PostForm, CommentForm
+from .paginators import CursorPaginator, paginate
+from .search import search_posts
+from .thumbnails import queue_thumbnails
+from .uploads import accept_images, upload_errors
+
+COMMENTS_PER_PAGE = 10
+COMMENTS_ORDERING = ('created', 'id')
+
 
+def wants_json(request):
+    """Запрос из JS (fetch/XHR) ждёт JSON вместо редиректа или HTML"""
+    return (request.GET.get('format') == 'json'
+            or 'application/json' in request.META.get('HTTP_ACCEPT', ''))
 
-@cache_page(20 * 1, key_prefix='index_page')
+
+@cache_page_versioned(60 * 60 * 4, key_prefix='index_page')
 def index(request):
-    post_list = Post.objects.select_related('group').all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'index.html', {'page': page,
-                                          'paginator': paginator})
+    post_list = Post.objects.for_feed()
+    return render(request, 'index.html', paginate(request, post_list))
 
 
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()[:12]
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'group.html', {
-                                          'group': group,
-                                          'posts': posts,
-                                          'page': page,
-                                          'paginator': paginator
-                                          })
+    posts = group.posts.for_feed()
+    return render(request, 'group.html', {'group': group,
+                                          **paginate(request, posts)})
+
+
+def search(request):
+    """Поиск по постам, самые релевантные - первыми"""
+    query = request.GET.get('q', '')
+    paginator = CursorPaginator(search_posts(query), 10,
+                                ordering=('-rank', '-pub_date', '-id'))
+    page = paginator.get_page(request.GET.get('cursor'))
+    return render(request, 'posts/search.html', {
+        'query': query,
+        'page': page,
+        'paginator': paginator,
+        'paginator_query': urlencode({'q': query}) + '&',
+    })
 
 
 @login_required
+@accept_images
 def new_post(request):
-    form = PostForm(request.POST or None, files=request.FILES or None)
+    form = PostForm(request.POST or None, files=request.FILES or None,
+                    upload_errors=upload_errors(request))
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
         form.save()
+        queue_thumbnails(post)
         return redirect('index')
     return render(request, 'posts/new.html', {'form': form})
 
 
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_records = Post.objects.filter(author=author)
-    paginator = Paginator(post_records, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    following = Follow.objects.filter(
-        user__username=request.user, author__username=username).all()
-    follower = Follow.objects.filter(author=author).count()
-    followed = Follow.objects.filter(user=author).count()
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
+    stats = get_stats(author)
+    post_records = Post.objects.for_feed().filter(author=author)
+    following = (request.user.is_authenticated
+                 and Follow.objects.filter(user=request.user,
+                                           author=author).exists())
+    # число постов берём из счётчика, а не запросом COUNT
+    pagination = paginate(request, post_records, count=stats.posts_count)
     return render(request, 'posts/profile.html', {'author': author,
+                                                  'stats': stats,
                                                   'following': following,
-                                                  'follower': follower,
-                                                  'followed': followed,
-                                                  'page': page,
-                                                  'paginator': paginator,
-                                                  'post_records': post_records})
+                                                  **pagination})
 
 
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
-    post_records = post.author.posts.count()
+    post = get_object_or_404(Post.objects.with_related()
+                             .select_related('author__stats'),
+                             id=post_id, author__username=username)
+    stats = get_stats(post.author)
     form_comment = CommentForm()
-    comments = Comment.objects.all()[:10]
+    comments = comments_page(post_comment_list(post.id),
+                             request.GET.get('comments_cursor'))
     return render(request, 'posts/post.html', {'author': post.author,
                                                'post': post,
-                                               'post_records': post_records,
+                                               'stats': stats,
                                                'comments': comments,
                                                'form_comment': form_comment})
 
 
+def post_comment_list(post_id):
+    return Comment.objects.filter(post_id=post_id).select_related('author')
+
+
+def comment_data(comment):
+    return {
+        'id': comment.id,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+    }
+
+
+def comments_page(comment_list, cursor=None):
+    """Страница комментариев поста, от старых к новым"""
+    paginator = CursorPaginator(comment_list, COMMENTS_PER_PAGE,
+                                ordering=COMMENTS_ORDERING)
+    return paginator.get_page(cursor)
+
+
+def post_comments(request, username, post_id):
+    """Следующая порция комментариев для кнопки "Показать ещё":
+    HTML-фрагмент или JSON при `?format=json`"""
+    post = get_object_or_404(Post.objects.only('id'),
+                             id=post_id, author__username=username)
+    comments = comments_page(post_comment_list(post.id),
+                             request.GET.get('cursor'))
+    if wants_json(request):
+        return JsonResponse({
+            'comments': [comment_data(comment)
+                         for comment in comments],
+            'next_cursor': comments.next_cursor,
+        })
+    return render(request, 'includes/comment_list.html',
+                  {'comments': comments, 'post': post,
+                   'username': username})
+
+
 @login_required
+@accept_images
 def post_edit(request, username, post_id):
     post = get_object_or_404(Post, id=post_id, author__username=username)
     if request.user != post.author:
         return redirect('index')
     form = PostForm(request.POST or None,
                     files=request.FILES or None,
-                    instance=post)
+                    instance=post,
+                    upload_errors=upload_errors(request))
     if form.is_valid():
         post = form.save()
+        if 'image' in form.changed_data:
+            queue_thumbnails(post)
         return redirect('post', username=request.user.username,
                         post_id=post_id)
     return render(request, 'posts/new.html', {'form': form, 'post': post})
@@ -98,7 +167,22 @@ def add_comment(request, username, post_id):
             new_comment.author = request.user
             new_comment.post = post
             new_comment.save()
+            if wants_json(request):
+                # счётчик после вставки: с учётом параллельных комментариев
+                comment_count = (Post.objects.filter(pk=post.pk)
+                                 .values_list('comment_count', flat=True)
+                                 .get())
+                # вместо перезагрузки страницы поста - один комментарий
+                return JsonResponse({
+                    'comment': comment_data(new_comment),
+                    'html': render_to_string('includes/comment.html',
+                                             {'item': new_comment},
+                                             request=request),
+                    'comment_count': comment_count,
+                }, status=201)
             return redirect('post', username=username, post_id=post_id)
+        if wants_json(request):
+            return JsonResponse({'errors': form_comment.errors}, status=400)
         return redirect('post', username=request.user.username, post_id=post_id)
     form_comment = CommentForm()
     return redirect('post', username=request.user.username, post_id=post_id)
@@ -108,29 +192,42 @@ def add_comment(request, username, post_id):
 def follow_index(request):
     """Функция страницы, куда будут выведены посты авторов,
     на которых подписан текущий пользователь"""
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'posts/follow.html', {'page': page,
-                                                'paginator': paginator})
+    post_list = follow_feed(request.user)
+    return render(request, 'posts/follow.html',
+                  paginate(request, post_list, ordering=FEED_ORDERING))
+
+
+def follow_response(request, author, following):
+    """Ответ подписки: JSON с новым состоянием кнопки для fetch-запроса,
+    иначе редирект на профиль"""
+    if not wants_json(request):
+        return redirect('profile', username=author.username)
+    action = 'profile_unfollow' if following else 'profile_follow'
+    return JsonResponse({
+        'following': following,
+        'followers_count': get_stats(author).followers_count,
+        'toggle_url': reverse(action, args=[author.username]),
+    })
 
 
 @login_required
+@pin_to_primary
 def profile_follow(request, username):
     """Функция для подписки на интересного автора"""
     author = get_object_or_404(User, username=username) # author пользователь, на которого подписываются
-    if request.user != author:
-        Follow.objects.get_or_create(user=request.user, author=author)
-    return redirect('profile', username=username)
+    if request.user == author:
+        return follow_response(request, author, False)
+    follows.follow(request.user.id, author.id)
+    return follow_response(request, author, True)
 
 
 @login_required
+@pin_to_primary
 def profile_unfollow(request, username):
     """Функция для того, чтобы отписаться от надоевшего графомана"""
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=author).delete()
-    return redirect('profile', username=username)
+    follows.unfollow(request.user.id, author.id)
+    return follow_response(request, author, False)
 
 
 def page_not_found(request, exception):
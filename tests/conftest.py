@@ -1,4 +1,40 @@
+import pytest
+
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
+    'tests.fixtures.fixture_queries',
 ]
+
+
+@pytest.fixture(scope='session', autouse=True)
+def test_cache():
+    """Тесты работают со своим кешем в памяти, а не с кешем проекта или
+    общим `CACHE_URL`, который `clear_cache` иначе стирал бы."""
+    from django.test.utils import override_settings
+    with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'tests'}}):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def clear_cache(test_cache):
+    """Кеш переживает тесты, а база - нет."""
+    from django.core.cache import cache
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    """Картинки тестов не должны попадать в `media/` проекта, а миниатюры
+    создаются сразу в запросе, без фоновых потоков."""
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    settings.POSTS_THUMBNAIL_WORKERS = 0
+
+
+@pytest.fixture(autouse=True)
+def no_replicas(settings):
+    """Тесты работают с одной базой, даже если заданы реплики
+    (DATABASE_REPLICA_URLS): маршрутизацию проверяет test_replicas."""
+    settings.DATABASE_REPLICAS = []
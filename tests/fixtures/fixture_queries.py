@@ -0,0 +1,28 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@pytest.fixture
+def assert_constant_queries():
+    """Проверяет, что число запросов к БД при открытии страницы ленты
+    не зависит от количества постов на ней.
+
+    `fill` вызывается между замерами и должен добавить постов в ленту."""
+    def check(client, url, fill):
+        def count():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+            assert response.status_code == 200, f'Страница `{url}` работает неправильно'
+            return len(queries)
+
+        before = count()
+        fill()
+        after = count()
+        assert before == after, \
+            f'Страница `{url}` делает {after} запросов вместо {before}: ' \
+            f'проверьте, что для постов нет запросов в цикле (N+1)'
+        return after
+    return check
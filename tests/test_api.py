@@ -0,0 +1,81 @@
+import pytest
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+
+class TestFeedApi:
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('url', ['/api/v1/posts/', '/api/v1/group/test-link/',
+                                     '/api/v1/{username}/', '/api/v1/{username}/{post_id}/'])
+    def test_api_conditional_get(self, client, post_with_group, url):
+        url = url.format(username=post_with_group.author.username, post_id=post_with_group.id)
+        response = client.get(url)
+        assert response.status_code == 200, f'Страница `{url}` работает неправильно'
+        assert response['ETag'].startswith('"'), f'Ответ `{url}` должен содержать сильный ETag'
+        assert 'Last-Modified' in response, f'Ответ `{url}` должен содержать Last-Modified'
+        data = response.json()
+        results = data['results'] if 'results' in data else [data]
+        assert results[0]['id'] == post_with_group.id and results[0]['group'] == 'test-link'
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        assert response.status_code == 304, f'Неизменившийся ресурс `{url}` должен отдавать 304'
+        assert len(queries) <= 1, f'Ответ 304 для `{url}` не должен загружать посты'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_api_etag_changes(self, client, post):
+        from posts.models import Comment
+        url = f'/api/v1/{post.author.username}/{post.id}/'
+        etag = client.get(url)['ETag']
+        Comment.objects.create(post=post, author=post.author, text='Комментарий')
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, 'После нового комментария пост должен отдаваться заново'
+        assert response.json()['comments']['results'][0]['text'] == 'Комментарий'
+
+        etag = client.get('/api/v1/posts/')['ETag']
+        post.text = 'Изменённый текст'
+        post.save()
+        response = client.get('/api/v1/posts/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, 'После правки поста лента должна отдаваться заново'
+        assert response.json()['results'][0]['text'] == 'Изменённый текст'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_api_comment_deleted(self, client, post):
+        import time
+        from posts.models import Comment
+        old, _ = [Comment.objects.create(post=post, author=post.author, text=f'Комментарий {i}')
+                  for i in range(2)]
+        url = f'/api/v1/{post.author.username}/{post.id}/'
+        last_modified = client.get(url)['Last-Modified']
+        # Last-Modified с точностью до секунды
+        time.sleep(1)
+        old.delete()
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == 200, \
+            'После удаления комментария пост не должен отдаваться как неизменившийся по If-Modified-Since'
+        assert len(response.json()['comments']['results']) == 1
+
+    @pytest.mark.django_db(transaction=True)
+    def test_api_follow(self, user_client, user, post):
+        from posts.models import Follow
+        assert Client().get('/api/v1/follow/').status_code == 401, \
+            'Лента подписок в API должна быть доступна только авторизованным'
+        response = user_client.get('/api/v1/follow/')
+        assert response.json()['results'] == []
+        Follow.objects.create(user=user, author=post.author)
+        response = user_client.get('/api/v1/follow/', HTTP_IF_NONE_MATCH=response['ETag'])
+        assert response.status_code == 200, 'После подписки лента должна отдаваться заново'
+        assert [item['id'] for item in response.json()['results']] == [post.id]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_api_cursor(self, client, user):
+        from posts.models import Post
+        posts = [Post.objects.create(text=f'Пост {i}', author=user) for i in range(12)]
+        data = client.get('/api/v1/posts/').json()
+        assert len(data['results']) == 10 and data['previous'] is None
+        data = client.get(f'/api/v1/posts/?cursor={data["next"]}').json()
+        assert [item['id'] for item in data['results']] == [posts[1].id, posts[0].id], \
+            'Следующая страница API должна продолжать предыдущую'
+        assert data['next'] is None
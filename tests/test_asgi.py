@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+
+def not_called(environ, start_response):
+    pytest.fail('Слишком большой запрос не должен доходить до Django')
+
+
+def call(application, headers, chunks):
+    scope = {'type': 'http', 'method': 'POST', 'path': '/new/', 'headers': headers}
+    messages = [{'type': 'http.request', 'body': chunk, 'more_body': True} for chunk in chunks]
+    messages[-1]['more_body'] = False
+    read = []
+    sent = []
+
+    async def receive():
+        read.append(messages[len(read)])
+        return read[-1]
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    return sent, len(read)
+
+
+class TestAsgi:
+
+    def test_declared_body_too_large(self):
+        from yatube.asgi import ThreadPoolWsgiToAsgi
+        application = ThreadPoolWsgiToAsgi(not_called, 1, max_body_size=10)
+        sent, read = call(application, [(b'content-length', b'11')], [b'x' * 11])
+        assert sent[0]['status'] == 413, \
+            'Запрос с Content-Length больше ASGI_MAX_BODY_SIZE должен получать ответ 413'
+        assert read == 0, 'Тело слишком большого запроса не должно читаться'
+
+    def test_streamed_body_too_large(self):
+        from yatube.asgi import ThreadPoolWsgiToAsgi
+        application = ThreadPoolWsgiToAsgi(not_called, 1, max_body_size=10)
+        sent, read = call(application, [], [b'x' * 6, b'x' * 6, b'x' * 6])
+        assert sent[0]['status'] == 413, \
+            'Тело больше ASGI_MAX_BODY_SIZE без Content-Length тоже должно отклоняться'
+        assert read == 2, 'Тело должно перестать читаться, как только превысит предел'
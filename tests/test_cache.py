@@ -0,0 +1,36 @@
+import pytest
+
+
+class TestPostCardCache:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_card_cache(self, user_client, post_with_group):
+        from posts.models import Post
+        url = f'/group/{post_with_group.group.slug}/'
+        user_client.get(url)
+        Post.objects.filter(pk=post_with_group.pk).update(text='Не попадёт в кеш')
+        response = user_client.get(url)
+        assert 'Не попадёт в кеш' not in response.content.decode(), \
+            'Проверьте, что карточка поста кешируется'
+
+        user_client.post(f'/{post_with_group.author.username}/{post_with_group.id}/edit/',
+                         data={'text': 'Отредактированный пост', 'group': post_with_group.group.id})
+        response = user_client.get(url)
+        assert 'Отредактированный пост' in response.content.decode(), \
+            'Проверьте, что кеш карточки сбрасывается при редактировании поста'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_card_cache_author(self, user_client, post_with_group):
+        from django.test import Client
+        url = f'/group/{post_with_group.group.slug}/'
+        assert 'Редактировать' in user_client.get(url).content.decode(), \
+            'Автор поста должен видеть ссылку на редактирование'
+        assert 'Редактировать' not in Client().get(url).content.decode(), \
+            'Закешированная карточка автора не должна показываться другим пользователям'
+
+
+def test_tests_use_own_cache():
+    from django.core.cache import caches
+    from django.core.cache.backends.locmem import LocMemCache
+    assert isinstance(caches['default'], LocMemCache), \
+        'Тесты не должны работать с кешем проекта и стирать его'
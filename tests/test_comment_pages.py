@@ -0,0 +1,50 @@
+import pytest
+from django.contrib.auth import get_user_model
+
+
+class TestCommentPages:
+
+    @pytest.fixture
+    def comments(self, post):
+        from posts.models import Comment
+        other = get_user_model().objects.create_user(username='Commenter')
+        other_post = post.__class__.objects.create(text='Другой пост', author=other)
+        Comment.objects.create(post=other_post, author=other, text='Чужой комментарий')
+        return [Comment.objects.create(post=post, author=other, text=f'Комментарий {i}')
+                for i in range(15)]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_post_view_comments(self, client, post, comments):
+        response = client.get(f'/{post.author.username}/{post.id}/')
+        page = response.context['comments']
+        assert [comment.id for comment in page] == [comment.id for comment in comments[:10]], \
+            'На странице поста должны выводиться первые комментарии этого поста'
+        assert page.has_next(), 'Для остальных комментариев должна быть кнопка "Показать ещё"'
+
+        response = client.get(f'/{post.author.username}/{post.id}/comments/?cursor={page.next_cursor}')
+        assert response.status_code == 200, 'Страница `/<username>/<post_id>/comments/` работает неправильно'
+        content = response.content.decode()
+        assert 'Комментарий 14' in content and 'Комментарий 9' not in content, \
+            'Фрагмент должен содержать следующую порцию комментариев'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_post_comments_json(self, client, post, comments):
+        response = client.get(f'/{post.author.username}/{post.id}/comments/?format=json')
+        data = response.json()
+        assert [item['id'] for item in data['comments']] == [comment.id for comment in comments[:10]], \
+            'JSON должен содержать комментарии поста от старых к новым'
+        assert data['comments'][0]['author'] == 'Commenter'
+        data = client.get(f'/{post.author.username}/{post.id}/comments/'
+                          f'?format=json&cursor={data["next_cursor"]}').json()
+        assert len(data['comments']) == 5 and data['next_cursor'] is None, \
+            'Последняя порция комментариев не должна содержать курсор'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_post_view_queries(self, client, post, assert_constant_queries):
+        from posts.models import Comment
+
+        def fill():
+            for i in range(9):
+                author = get_user_model().objects.create_user(username=f'Commenter_{i}')
+                Comment.objects.create(post=post, author=author, text='Комментарий')
+        assert_constant_queries(client, f'/{post.author.username}/{post.id}/', fill)
@@ -0,0 +1,68 @@
+import pytest
+from django.utils import timezone
+
+from posts.paginators import CursorPage, CursorPaginator
+
+
+class TestCursorPaginator:
+
+    @pytest.fixture
+    def posts(self, user):
+        from posts.models import Post
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=user) for i in range(25)
+        )
+        # одинаковая дата у части постов проверяет сортировку по id
+        Post.objects.filter(id__in=Post.objects.values('id')[:10]).update(pub_date=timezone.now())
+        return list(Post.objects.order_by('-pub_date', '-id'))
+
+    @pytest.mark.django_db(transaction=True)
+    def test_walk_forward_and_back(self, posts):
+        from posts.models import Post
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        page = paginator.get_page()
+        assert not page.has_previous(), 'Первая страница не должна иметь предыдущей'
+        pages = [page]
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor)
+            pages.append(page)
+        assert [len(p) for p in pages] == [10, 10, 5], 'Проверьте размер страниц курсорного паджинатора'
+        assert [post.id for p in pages for post in p] == [post.id for post in posts], \
+            'Курсорный паджинатор должен обойти все посты без пропусков и повторов'
+
+        back = paginator.get_page(pages[-1].previous_cursor)
+        assert [post.id for post in back] == [post.id for post in pages[1]], \
+            'Переход на предыдущую страницу должен вернуть ту же страницу'
+        back = paginator.get_page(back.previous_cursor)
+        assert [post.id for post in back] == [post.id for post in pages[0]]
+        assert not back.has_previous()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_broken_cursor(self, posts):
+        from posts.models import Post
+        page = CursorPaginator(Post.objects.all(), 10).get_page('не-курсор')
+        assert [post.id for post in page] == [post.id for post in posts[:10]], \
+            'На некорректный курсор должна отдаваться первая страница'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_index_cursor_view(self, client, posts):
+        response = client.get('/?cursor=')
+        assert type(response.context['page']) == CursorPage, \
+            'Параметр `?cursor=` должен включать курсорную паджинацию на `/`'
+        next_cursor = response.context['page'].next_cursor
+        assert f'?cursor={next_cursor}' in response.content.decode(), \
+            'Проверьте, что в паджинатор выведена ссылка на следующую страницу'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_cursor_query_uses_index_range(self, posts):
+        from django.db import connection
+        from posts.models import Post
+        if connection.vendor != 'sqlite':
+            pytest.skip('План запроса проверяется на SQLite')
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        values = paginator.decode_cursor(paginator.get_page().next_cursor)[1]
+        for reverse in (False, True):
+            plan = Post.objects.filter(paginator._keyset_filter(values, reverse)) \
+                .order_by('-pub_date', '-id').explain()
+            assert 'SEARCH' in plan and ('pub_date<' in plan or 'pub_date>' in plan), \
+                'Условие курсора должно читать диапазон индекса по `pub_date`, а не весь индекс'
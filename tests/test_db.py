@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+
+
+class FakeConnection:
+
+    def __init__(self, usable, health_checks=True, in_atomic_block=False):
+        self.connection = object()
+        self.usable = usable
+        self.settings_dict = {'CONN_HEALTH_CHECKS': health_checks}
+        self.in_atomic_block = in_atomic_block
+        self.checks = self.connects = 0
+
+    def is_usable(self):
+        self.checks += 1
+        return self.usable
+
+    def close(self):
+        self.connection = None
+
+    def ensure_connection(self):
+        if self.connection is None:
+            self.connection = object()
+            self.connects += 1
+
+
+class FakeConnections:
+
+    def __init__(self, *connections):
+        self.connections = connections
+
+    def all(self):
+        return list(self.connections)
+
+
+class TestConnections:
+
+    def test_settings(self, settings):
+        database = settings.DATABASES['default']
+        assert database['CONN_MAX_AGE'], 'Соединения с базой должны переживать запрос'
+        assert database['CONN_HEALTH_CHECKS']
+
+    def test_health_checks(self, monkeypatch):
+        from posts import db
+        alive = FakeConnection(usable=True)
+        dead = FakeConnection(usable=False)
+        unchecked = FakeConnection(usable=False, health_checks=False)
+        in_transaction = FakeConnection(usable=False, in_atomic_block=True)
+        monkeypatch.setattr(db, 'connections', FakeConnections(alive, dead, unchecked, in_transaction))
+        db.check_connections()
+        assert not any(connection.checks for connection in (alive, dead, unchecked, in_transaction)), \
+            'Соединения должны проверяться при первом обращении, а не все подряд в начале запроса'
+        alive.ensure_connection()
+        alive.ensure_connection()
+        assert alive.checks == 1 and alive.connects == 0
+        dead.ensure_connection()
+        assert dead.connects == 1, \
+            'Неработающее соединение должно закрываться и открываться заново'
+        unchecked.ensure_connection()
+        in_transaction.ensure_connection()
+        assert unchecked.checks == in_transaction.checks == 0
+
+    def test_pool_engines(self):
+        env = {**os.environ, 'DATABASE_URL': 'sqlite:////tmp/pool.sqlite3', 'DATABASE_POOL_SIZE': '5'}
+        result = subprocess.run([sys.executable, '-c', 'import yatube.settings'],
+                                env=env, capture_output=True, text=True)
+        assert 'ImproperlyConfigured' in result.stderr, \
+            'Пул соединений для SQLite должен давать ошибку настройки, а не подменять движок'
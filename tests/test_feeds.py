@@ -0,0 +1,75 @@
+from io import StringIO
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+
+
+class TestFollowFeed:
+
+    @pytest.fixture
+    def authors(self):
+        User = get_user_model()
+        return [User.objects.create_user(username=f'Author_{i}') for i in range(2)]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_fan_out_on_write(self, user, authors):
+        from posts.models import FeedEntry, Follow, Post
+        Follow.objects.create(user=user, author=authors[0])
+        post = Post.objects.create(text='Тестовый пост', author=authors[0])
+        Post.objects.create(text='Чужой пост', author=authors[1])
+        assert list(FeedEntry.objects.filter(user=user).values_list('post', flat=True)) == [post.id], \
+            'Новый пост должен попадать в материализованную ленту подписчиков автора'
+
+        Follow.objects.filter(user=user, author=authors[0]).delete()
+        assert not FeedEntry.objects.filter(user=user).exists(), \
+            'После отписки посты автора должны убираться из ленты'
+
+        Follow.objects.create(user=user, author=authors[0])
+        assert FeedEntry.objects.filter(user=user, post=post).exists(), \
+            'После подписки в ленту должны попадать последние посты автора'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_fan_out_on_read(self, settings, user_client, user, authors):
+        from posts.models import FeedEntry, Follow, Post
+        settings.POSTS_FEED_FANOUT_MAX_FOLLOWERS = 1
+        Follow.objects.create(user=user, author=authors[0])
+        Follow.objects.create(user=authors[1], author=authors[0])
+        post = Post.objects.create(text='Пост популярного автора', author=authors[0])
+        assert not FeedEntry.objects.filter(post=post).exists(), \
+            'Посты авторов с большим числом подписчиков не должны раскладываться по лентам'
+        response = user_client.get('/follow/')
+        assert [p.id for p in response.context['page']] == [post.id], \
+            'Посты популярных авторов должны подмешиваться в ленту при чтении'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_rebuild_feeds(self, user, authors):
+        from posts.models import FeedEntry, Follow, Post
+        Follow.objects.create(user=user, author=authors[0])
+        post = Post.objects.create(text='Тестовый пост', author=authors[0])
+        FeedEntry.objects.all().delete()
+        call_command('rebuild_feeds', stdout=StringIO())
+        assert list(FeedEntry.objects.values_list('user', 'post')) == [(user.id, post.id)], \
+            'Команда `rebuild_feeds` должна восстанавливать ленты подписок'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_feed_cursor(self, user_client, user, authors):
+        from posts.models import Follow, Post
+        Follow.objects.create(user=user, author=authors[0])
+        posts = [Post.objects.create(text=f'Пост {i}', author=authors[0]) for i in range(12)]
+        response = user_client.get('/follow/?cursor=')
+        page = response.context['page']
+        assert [post.id for post in page] == [post.id for post in reversed(posts)][:10], \
+            'Лента подписок должна быть отсортирована от новых постов к старым'
+        response = user_client.get(f'/follow/?cursor={page.next_cursor}')
+        assert [post.id for post in response.context['page']] == [posts[1].id, posts[0].id], \
+            'Вторая страница ленты подписок должна продолжать первую'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_explain_feeds(self):
+        output = StringIO()
+        call_command('explain_feeds', seed=200, stdout=output)
+        assert 'follow_index (cursor): OK' in output.getvalue(), \
+            'Запросы лент должны читаться по индексам без сортировки'
+        assert 'post_view comments (cursor): OK' in output.getvalue(), \
+            'Курсорные страницы комментариев тоже должны проверяться по плану запроса'
@@ -0,0 +1,78 @@
+from io import BytesIO, StringIO
+from pathlib import Path
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from PIL import Image
+
+
+def image_file(color):
+    buffer = BytesIO()
+    Image.new('RGB', (50, 50), color).save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue(), name='image.png')
+
+
+def media_files():
+    from django.conf import settings
+    return {path for path in Path(settings.MEDIA_ROOT).rglob('*') if path.is_file()}
+
+
+@pytest.fixture
+def garbage(user):
+    """Живой пост с картинкой и пост, ссылку на картинку которого стёрли в
+    обход сигналов, плюс миниатюра без записи в kvstore."""
+    from django.conf import settings
+    from posts.models import Post
+    from posts.thumbnails import render_thumbnails
+    live = Post(text='Живой пост', author=user)
+    live.image.save('live.png', image_file((255, 0, 0)))
+    orphan = Post(text='Пост без картинки', author=user)
+    orphan.image.save('orphan.png', image_file((0, 0, 255)))
+    for post in (live, orphan):
+        render_thumbnails(post.image.name)
+    kept = media_files()
+    Post.objects.filter(id=orphan.id).update(image='')
+    stray = Path(settings.MEDIA_ROOT) / 'cache' / 'ff' / 'ff' / 'stray.jpg'
+    stray.parent.mkdir(parents=True)
+    stray.write_bytes(b'jpeg')
+    return live, orphan.image.name, kept
+
+
+class TestGcMedia:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_dry_run(self, garbage):
+        files = media_files()
+        out = StringIO()
+        call_command('gc_media', dry_run=True, min_age=0, verbosity=2, stdout=out)
+        assert media_files() == files, 'В режиме --dry-run ничего не должно удаляться'
+        assert garbage[1] in out.getvalue(), \
+            'Проверьте, что --dry-run показывает найденные картинки без постов'
+        assert 'stray.jpg' in out.getvalue()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_collect(self, garbage):
+        from sorl.thumbnail import default
+        from posts.storage import image_file as sorl_image_file
+        live, orphan, kept = garbage
+        call_command('gc_media', min_age=0, batch_size=2, stdout=StringIO())
+        files = media_files()
+        assert Path(live.image.path) in files, 'Картинка живого поста должна остаться'
+        assert not any(path.name == 'stray.jpg' for path in files), \
+            'Миниатюры без записей kvstore должны удаляться'
+        assert not any(orphan.split('/')[-1] in str(path) for path in files), \
+            'Картинки без постов должны удаляться'
+        assert len(files) < len(kept), 'Миниатюры картинки без поста должны удаляться'
+        assert default.kvstore.get(sorl_image_file(orphan)) is None, \
+            'Записи kvstore о картинке без поста должны удаляться'
+        assert default.kvstore.get(sorl_image_file(live.image.name)) is not None
+
+        call_command('gc_media', min_age=0, stdout=StringIO())
+        assert media_files() == files, 'Повторный запуск не должен удалять живые файлы'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_min_age(self, garbage):
+        files = media_files()
+        call_command('gc_media', stdout=StringIO())
+        assert media_files() == files, 'Свежие файлы не должны удаляться'
@@ -0,0 +1,83 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+JSON = {'HTTP_ACCEPT': 'application/json'}
+
+
+@pytest.fixture
+def author():
+    return get_user_model().objects.create_user(username='Author')
+
+
+class TestJsonActions:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow(self, user_client, user, author):
+        from posts.models import Follow, UserStats
+        with CaptureQueriesContext(connection) as queries:
+            response = user_client.get(f'/{author.username}/follow/', **JSON)
+        assert response.status_code == 200, 'Подписка из JS должна отвечать JSON, а не редиректом'
+        assert response.json() == {'following': True, 'followers_count': 1,
+                                   'toggle_url': f'/{author.username}/unfollow/'}
+        assert not any(query['sql'].startswith('SELECT') and 'posts_follow' in query['sql']
+                       for query in queries.captured_queries), \
+            'Подписка должна быть одним INSERT без предварительного SELECT'
+
+        data = user_client.get(f'/{author.username}/follow/', **JSON).json()
+        assert data['followers_count'] == 1 and Follow.objects.count() == 1, \
+            'Повторная подписка не должна ничего менять'
+        assert UserStats.objects.get(user=user).following_count == 1
+
+        data = user_client.get(f'/{author.username}/unfollow/', **JSON).json()
+        assert data == {'following': False, 'followers_count': 0,
+                        'toggle_url': f'/{author.username}/follow/'}
+        data = user_client.get(f'/{author.username}/unfollow/', **JSON).json()
+        assert data['followers_count'] == 0 and not Follow.objects.exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_updates_feed(self, user_client, author):
+        from posts.models import Post
+        post = Post.objects.create(text='Пост автора', author=author)
+        user_client.get(f'/{author.username}/follow/', **JSON)
+        response = user_client.get('/follow/')
+        assert post in response.context['page'], \
+            'После подписки посты автора должны попадать в ленту'
+        user_client.get(f'/{author.username}/unfollow/', **JSON)
+        response = user_client.get('/follow/')
+        assert post not in response.context['page']
+
+    @pytest.mark.django_db(transaction=True)
+    def test_add_comment(self, user_client, post):
+        from posts.models import Comment
+        url = f'/{post.author.username}/{post.id}/comment/'
+        response = user_client.post(url, {'text': 'Комментарий из JS'}, **JSON)
+        assert response.status_code == 201, 'Комментарий из JS должен отвечать JSON, а не редиректом'
+        data = response.json()
+        comment = Comment.objects.get()
+        assert data['comment']['id'] == comment.id and data['comment_count'] == 1
+        assert 'Комментарий из JS' in data['html'] and f'comment_{comment.id}' in data['html'], \
+            'Ответ должен содержать готовый HTML комментария'
+
+        response = user_client.post(url, {'text': ''}, **JSON)
+        assert response.status_code == 400 and 'text' in response.json()['errors']
+
+    @pytest.mark.django_db(transaction=True)
+    def test_comment_count_after_insert(self, user_client, post):
+        from django.db.models.signals import post_save
+        from posts import counters
+        from posts.models import Comment
+
+        def concurrent_comment(sender, instance, created, **kwargs):
+            # другой пользователь прокомментировал, пока шёл запрос
+            counters.bump_comments(instance.post_id, 1)
+
+        post_save.connect(concurrent_comment, sender=Comment)
+        try:
+            response = user_client.post(f'/{post.author.username}/{post.id}/comment/',
+                                        {'text': 'Комментарий'}, **JSON)
+        finally:
+            post_save.disconnect(concurrent_comment, sender=Comment)
+        assert response.json()['comment_count'] == 2, \
+            'Число комментариев в ответе должно читаться после вставки, а не считаться по старому значению'
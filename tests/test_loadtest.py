@@ -0,0 +1,27 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+
+class TestLoadtest:
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('asgi', [False, True])
+    def test_seed_and_loadtest(self, tmp_path, asgi):
+        from posts.models import Comment, FeedEntry, Post, User
+        call_command('seed_yatube', users=5, groups=2, posts=30, follows=2, comments=20,
+                     images=1, stdout=StringIO())
+        assert User.objects.count() == 5 and Post.objects.count() == 30
+        assert Comment.objects.count() == 20 and FeedEntry.objects.exists(), \
+            'Команда `seed_yatube` должна создавать данные и перестраивать ленты'
+
+        output = tmp_path / 'report.json'
+        call_command('loadtest', clients=2, requests=40, seed=1, output=str(output),
+                     asgi=asgi, stdout=StringIO())
+        rows = {row['url_name']: row for row in json.loads(output.read_text())['rows']}
+        assert rows['total']['requests'] == 40
+        assert rows['total']['errors'] == 0, 'Прогон не должен получать ответы 5xx'
+        assert 'index' in rows and rows['index']['p99'] >= rows['index']['p50'] > 0
+        assert rows['index']['queries'] > 0, 'Отчёт должен считать запросы к БД'
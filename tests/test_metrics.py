@@ -0,0 +1,62 @@
+import pytest
+from django.test import Client
+
+
+class TestMetrics:
+
+    @pytest.fixture(autouse=True)
+    def registry(self, settings):
+        from posts.metrics import registry
+        settings.POSTS_METRICS_SAMPLE_RATE = 1
+        registry.reset()
+        return registry
+
+    @pytest.mark.django_db(transaction=True)
+    def test_server_timing(self, post):
+        response = Client().get(f'/{post.author.username}/{post.id}/')
+        timing = response['Server-Timing']
+        assert 'db;dur=' in timing and 'tpl;dur=' in timing and 'cache;desc=' in timing, \
+            'Замеренный запрос должен отдавать заголовок Server-Timing'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_metrics_endpoint(self, settings, registry, post):
+        settings.POSTS_METRICS_TOKEN = 'secret'
+        client = Client()
+        client.get('/')
+        client.get('/')
+        response = client.get('/-/metrics/', HTTP_AUTHORIZATION='Bearer secret')
+        assert response.status_code == 200
+        text = response.content.decode()
+        assert 'yatube_requests_total{view="index",method="GET",status="200"} 2' in text, \
+            'Метрики должны считать запросы по view'
+        assert 'yatube_cache_requests_total{view="index",result="hit"}' in text, \
+            'Второй запрос главной страницы должен попадать в кеш'
+        assert 'yatube_request_duration_seconds_bucket{view="index",le="+Inf"} 2' in text
+        assert 'yatube_db_queries_total{view="index"}' in text
+
+        response = client.get('/-/metrics/', REMOTE_ADDR='10.0.0.1')
+        assert response.status_code == 404, 'Метрики не должны быть доступны снаружи'
+        response = client.get('/-/metrics/', REMOTE_ADDR='127.0.0.1')
+        assert response.status_code == 404, \
+            'За обратным прокси все клиенты приходят с 127.0.0.1: адресу доверять нельзя'
+        response = client.get('/-/metrics/', HTTP_AUTHORIZATION='Bearer wrong')
+        assert response.status_code == 404
+
+    @pytest.mark.django_db(transaction=True)
+    def test_metrics_without_token(self, settings, registry):
+        from django.contrib.auth import get_user_model
+        settings.POSTS_METRICS_TOKEN = ''
+        client = Client()
+        assert client.get('/-/metrics/', HTTP_AUTHORIZATION='Bearer ').status_code == 404, \
+            'Без настроенного токена метрики доступны только суперпользователю'
+        admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'pass')
+        client.force_login(admin)
+        assert client.get('/-/metrics/').status_code == 200
+
+    @pytest.mark.django_db(transaction=True)
+    def test_sampling_off(self, settings, registry, post):
+        settings.POSTS_METRICS_SAMPLE_RATE = 0
+        response = Client().get('/')
+        assert 'Server-Timing' not in response, \
+            'Без замера заголовок Server-Timing не нужен'
+        assert registry.count['index'] == 1 and not registry.sampled
@@ -51,9 +51,12 @@ class TestPostView:
         assert type(comment_form_context.fields['text']) == forms.fields.CharField, \
             'Проверьте, что форма комментария в контекстке страницы `/<username>/<post_id>/` содержится поле `text` типа `CharField`'
 
-        comment_context = get_field_context(response.context, QuerySet)
+        from posts.paginators import CursorPage
+        comment_context = get_field_context(response.context, CursorPage)
         assert comment_context is not None, \
-            'Проверьте, что передали список комментариев в контекст страницы `/<username>/<post_id>/` типа `QuerySet`'
+            'Проверьте, что передали страницу комментариев в контекст страницы `/<username>/<post_id>/` типа `CursorPage`'
+        assert get_field_context(response.context, QuerySet) is None, \
+            'Страница поста не должна передавать в контекст все комментарии без паджинации'
 
 
 class TestPostEditView:
@@ -0,0 +1,96 @@
+from io import StringIO
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+
+
+class TestFeedQueries:
+
+    @pytest.fixture
+    def fill(self, user, group):
+        from posts.models import Comment, Follow, Post
+        author = get_user_model().objects.create_user(username='TestAuthor')
+        Follow.objects.create(user=user, author=author)
+        Post.objects.create(text='Первый пост', author=author, group=group)
+
+        def fill():
+            for i in range(9):
+                post = Post.objects.create(text=f'Пост {i}', author=author, group=group)
+                Comment.objects.create(post=post, author=user, text='Комментарий')
+        return author, fill
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('url', ['/', '/follow/', '/group/test-link/', '/TestAuthor/'])
+    def test_feed_queries(self, user_client, fill, assert_constant_queries, url):
+        assert_constant_queries(user_client, url, fill[1])
+
+    @pytest.mark.django_db(transaction=True)
+    def test_feed_queries_cursor(self, user_client, fill, assert_constant_queries):
+        assert_constant_queries(user_client, '/?cursor=', fill[1])
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('url', ['/', '/follow/', '/group/test-link/', '/TestAuthor/'])
+    def test_feed_preview(self, user_client, fill, url):
+        from posts.models import Post
+        from posts.rendering import EXCERPT_LENGTH
+        author, _ = fill
+        text = 'начало ' + 'б' * EXCERPT_LENGTH + ' конец'
+        post = Post.objects.create(text=text, author=author, group=author.posts.get().group)
+        response = user_client.get(url)
+        card = response.context['page'][0]
+        assert card == post
+        assert {'text', 'text_html'}.isdisjoint(card.__dict__) and \
+            'email' not in card.author.__dict__ and 'description' not in card.group.__dict__, \
+            'Ленты не должны загружать полный текст поста и лишние колонки автора и группы'
+        content = response.content.decode()
+        assert 'начало' in content and 'конец' not in content, \
+            'Карточка в ленте должна показывать только начало длинного поста'
+
+        response = user_client.get(f'/{author.username}/{post.id}/')
+        assert 'конец' in response.content.decode(), \
+            'Страница поста должна показывать полный текст'
+
+
+class TestCounters:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_counters(self, user, post):
+        from posts.models import Comment, Follow, Post, UserStats
+        author = get_user_model().objects.create_user(username='TestAuthor')
+        Follow.objects.create(user=user, author=author)
+        comment = Comment.objects.create(post=post, author=author, text='Комментарий')
+        stats = UserStats.objects.get(user=user)
+        assert (stats.posts_count, stats.followers_count, stats.following_count) == (1, 0, 1), \
+            'Проверьте, что счётчики пользователя обновляются при создании постов и подписок'
+        assert UserStats.objects.get(user=author).followers_count == 1
+        assert Post.objects.get(pk=post.pk).comment_count == 1, \
+            'Проверьте, что `Post.comment_count` обновляется при добавлении комментария'
+
+        comment.delete()
+        Follow.objects.all().delete()
+        assert Post.objects.get(pk=post.pk).comment_count == 0
+        assert UserStats.objects.get(user=user).following_count == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_recount(self, user, post):
+        from posts.models import Post, UserStats
+        UserStats.objects.filter(user=user).update(posts_count=42)
+        Post.objects.filter(pk=post.pk).update(comment_count=7)
+        call_command('recount', stdout=StringIO())
+        assert UserStats.objects.get(user=user).posts_count == 1, \
+            'Команда `recount` должна исправлять расхождения счётчиков'
+        assert Post.objects.get(pk=post.pk).comment_count == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_no_aggregates(self, client, post):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            client.get(f'/{post.author.username}/{post.id}/')
+        assert not [q for q in queries if 'COUNT(' in q['sql']], \
+            'Страница поста не должна считать записи запросами'
+        with CaptureQueriesContext(connection) as queries:
+            client.get(f'/{post.author.username}/')
+        assert not [q for q in queries if 'COUNT(' in q['sql']], \
+            'Страница профиля не должна считать посты и подписчиков запросами'
@@ -0,0 +1,44 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+
+class TestRendering:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_rendered_on_save(self, user_client, post):
+        from posts.models import Comment, Post
+        from posts.rendering import EXCERPT_LENGTH
+        text = '<b>жирный</b>\nвторая строка ' + 'я' * EXCERPT_LENGTH
+        user_client.post(f'/{post.author.username}/{post.id}/edit/', {'text': text})
+        post = Post.objects.get(pk=post.pk)
+        assert post.text_html.startswith('&lt;b&gt;жирный&lt;/b&gt;<br>вторая строка'), \
+            'При сохранении поста должен сохраняться экранированный HTML текста'
+        assert post.truncated and len(post.excerpt_html) < len(post.text_html)
+
+        user_client.post(f'/{post.author.username}/{post.id}/comment/', {'text': '<i>а</i>\nб'})
+        assert Comment.objects.get().text_html == '&lt;i&gt;а&lt;/i&gt;<br>б', \
+            'При сохранении комментария должен сохраняться экранированный HTML текста'
+
+        content = user_client.get(f'/{post.author.username}/{post.id}/').content.decode()
+        assert post.text_html in content and '&lt;i&gt;а&lt;/i&gt;<br>б' in content
+        assert '&amp;lt;' not in content, 'Готовый HTML не должен экранироваться повторно'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_render_texts(self, post):
+        from posts.models import Comment, Post
+        comment = Comment.objects.create(post=post, author=post.author, text='а\nб')
+        Post.objects.update(text_html='', excerpt_html='')
+        Comment.objects.update(text_html='')
+        out = StringIO()
+        call_command('render_texts', stdout=out)
+        assert 'постов: 1, комментариев: 1' in out.getvalue()
+        assert Post.objects.get().text_html == 'Тестовый пост 1', \
+            'Команда `render_texts` должна заполнять HTML строк без него'
+        assert Comment.objects.get(pk=comment.pk).text_html == 'а<br>б'
+
+        out = StringIO()
+        call_command('render_texts', '--all', stdout=out)
+        assert 'постов: 0, комментариев: 0' in out.getvalue(), \
+            'Строки с актуальным HTML не должны перезаписываться'
@@ -0,0 +1,85 @@
+import pytest
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+
+@pytest.fixture
+def replicas(settings):
+    settings.DATABASE_REPLICAS = ['replica1']
+
+
+def route(method='get', cookies=None, view=None):
+    """Выполняет запрос через ReplicaMiddleware, возвращает (база для чтения
+    внутри view, ответ)."""
+    from posts.db import ReplicaMiddleware, ReplicaRouter
+    from posts.models import Post
+    used = []
+
+    def read(request):
+        used.append(ReplicaRouter().db_for_read(Post))
+        return HttpResponse()
+
+    request = getattr(RequestFactory(), method)('/')
+    request.COOKIES.update(cookies or {})
+    response = ReplicaMiddleware(view(read) if view else read)(request)
+    return used[0], response
+
+
+class TestReplicaRouter:
+
+    def test_outside_request(self, replicas):
+        from posts.db import ReplicaRouter
+        from posts.models import Post
+        router = ReplicaRouter()
+        assert router.db_for_read(Post) == 'default', \
+            'Вне запроса (команды, фоновые потоки) чтение должно идти с основной базы'
+        assert router.db_for_write(Post) == 'default'
+        assert not router.allow_migrate('replica1', 'posts')
+
+    def test_safe_request_reads_replica(self, replicas):
+        database, response = route()
+        assert database == 'replica1', 'GET-запрос должен читать с реплики'
+        assert 'use_primary' not in response.cookies
+
+    def test_sessions_read_primary(self, replicas):
+        from django.contrib.sessions.models import Session
+        from posts.db import ReplicaRouter
+
+        def view(read):
+            def wrapper(request):
+                used.append(ReplicaRouter().db_for_read(Session))
+                return read(request)
+            return wrapper
+
+        used = []
+        route(view=view)
+        assert used == ['default'], 'Сессии должны читаться с основной базы'
+
+    def test_read_your_writes(self, replicas):
+        database, response = route('post')
+        assert database == 'default', 'Запрос с записью должен читать с основной базы'
+        cookie = response.cookies['use_primary']
+        assert cookie['max-age'], 'После записи чтение должно временно закрепляться за основной базой'
+        database, _ = route(cookies={'use_primary': cookie.value})
+        assert database == 'default', \
+            'Пока есть cookie, пользователь должен читать с основной базы'
+
+    def test_pin_to_primary(self, replicas):
+        from posts.db import pin_to_primary
+        database, response = route(view=pin_to_primary)
+        assert database == 'default' and 'use_primary' in response.cookies, \
+            'GET-view с записью (подписка) должен читать с основной базы и ставить cookie'
+
+    def test_page_cache_reads_primary(self, replicas):
+        from posts.cache import cache_page_versioned
+
+        def view(read):
+            return cache_page_versioned(60, key_prefix='test_replicas')(read)
+
+        database, _ = route(view=view)
+        assert database == 'default', \
+            'Страница для общего кеша должна читаться с основной базы, а не с отставшей реплики'
+
+    def test_without_replicas(self):
+        database, _ = route()
+        assert database == 'default'
@@ -0,0 +1,46 @@
+import pytest
+
+from posts.search import stem
+
+
+class TestSearch:
+
+    def test_russian_stemming(self):
+        assert stem('кошки') == stem('кошка') == stem('кошкам'), \
+            'Проверьте, что разные формы слова приводятся к одной основе'
+        assert stem('Ёлки') == stem('елка')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_search_view(self, client, user):
+        from posts.models import Post
+        Post.objects.create(text='Кошка спала на крыше', author=user)
+        best = Post.objects.create(text='Кошки, кошки, кошки и крыши!', author=user)
+        Post.objects.create(text='Собака спала у будки', author=user)
+        response = client.get('/search/', {'q': 'кошку на крышах'})
+        assert response.status_code == 200, 'Страница `/search/` не найдена'
+        found = [post.text for post in response.context['page']]
+        assert found == [best.text, 'Кошка спала на крыше'], \
+            'Поиск должен находить посты со всеми словами запроса, самые релевантные - первыми'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_search_pagination(self, client, user):
+        from posts.models import Post
+        for i in range(15):
+            Post.objects.create(text=f'Пост про котов номер {i}', author=user)
+        response = client.get('/search/', {'q': 'кот'})
+        page = response.context['page']
+        assert len(page) == 10 and page.has_next()
+        assert f'?q=%D0%BA%D0%BE%D1%82&amp;cursor={page.next_cursor}' in response.content.decode(), \
+            'Ссылка на следующую страницу поиска должна сохранять запрос'
+        response = client.get('/search/', {'q': 'кот', 'cursor': page.next_cursor})
+        assert len(response.context['page']) == 5
+
+    @pytest.mark.django_db(transaction=True)
+    def test_search_index_updates(self, user):
+        from posts.models import Post
+        from posts.search import search_posts
+        post = Post.objects.create(text='Первый вариант', author=user)
+        post.text = 'Второй вариант'
+        post.save()
+        assert not search_posts('первый').exists(), 'Индекс поиска должен обновляться при изменении поста'
+        assert list(search_posts('второго')) == [post]
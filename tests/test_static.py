@@ -0,0 +1,101 @@
+import gzip
+from io import StringIO
+from pathlib import Path
+from wsgiref.util import setup_testing_defaults
+
+import pytest
+from django.core.management import call_command
+
+
+def fallback(environ, start_response):
+    start_response('404 Not Found', [('Content-Type', 'text/plain')])
+    return [b'django']
+
+
+def request(server, path, method='GET', **headers):
+    environ = {'REQUEST_METHOD': method, 'PATH_INFO': path}
+    environ.update(headers)
+    setup_testing_defaults(environ)
+    response = {}
+
+    def start_response(status, response_headers, exc_info=None):
+        response['status'] = int(status.split()[0])
+        response['headers'] = dict(response_headers)
+
+    body = b''.join(server(environ, start_response))
+    return response['status'], response['headers'], body
+
+
+@pytest.fixture
+def media_file(settings):
+    def create(name, content=b'image'):
+        path = Path(settings.MEDIA_ROOT) / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+        return path
+    return create
+
+
+class TestFileServer:
+
+    def test_hashed_media_is_immutable(self, media_file):
+        from yatube.static import FileServer
+        name = 'posts/ab/' + 'ab' * 32 + '.png'
+        media_file(name)
+        server = FileServer(fallback)
+        status, headers, body = request(server, '/media/' + name)
+        assert status == 200 and body == b'image'
+        assert headers['Content-Type'] == 'image/png'
+        assert 'immutable' in headers['Cache-Control'], \
+            'Картинки с хешем в имени должны кешироваться навсегда'
+
+        status, _, body = request(server, '/media/' + name, HTTP_IF_NONE_MATCH=headers['ETag'])
+        assert status == 304 and body == b'', 'Проверьте ответ 304 на If-None-Match'
+        status, headers, body = request(server, '/media/' + name, method='HEAD')
+        assert status == 200 and body == b'' and headers['Content-Length'] == '5'
+
+    def test_plain_media_is_revalidated(self, media_file):
+        from yatube.static import FileServer
+        media_file('posts/old.png')
+        status, headers, _ = request(FileServer(fallback), '/media/posts/old.png')
+        assert status == 200
+        assert 'immutable' not in headers['Cache-Control'], \
+            'Файл без хеша в имени может измениться и не должен кешироваться навсегда'
+
+    @pytest.mark.parametrize('path', [
+        '/media/posts/missing.png',
+        '/media/posts/../../secret.txt',
+        '/media/posts',
+        '/media/',
+    ])
+    def test_fall_through(self, media_file, path):
+        from yatube.static import FileServer
+        media_file('secret.txt')
+        media_file('posts/image.png')
+        status, _, body = request(FileServer(fallback), path)
+        assert (status, body) == (404, b'django'), \
+            'Всё, что не является файлом внутри MEDIA_ROOT, должен обрабатывать Django'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_collectstatic(self, settings, tmp_path, client):
+        from django.contrib.staticfiles.storage import staticfiles_storage
+        from yatube.static import FileServer
+        settings.STATIC_ROOT = str(tmp_path / 'static')
+        call_command('collectstatic', interactive=False, verbosity=0, stdout=StringIO())
+        url = staticfiles_storage.url('bootstrap/dist/css/bootstrap.min.css')
+        assert url != '/static/bootstrap/dist/css/bootstrap.min.css', \
+            'Собранная статика должна получать имена с хешем содержимого'
+        assert url in client.get('/').content.decode(), \
+            'Шаблоны должны ссылаться на статику с хешем в имени'
+
+        server = FileServer(fallback)
+        status, headers, body = request(server, url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        original = Path(staticfiles_storage.path(url[len(settings.STATIC_URL):])).read_bytes()
+        assert status == 200 and headers['Content-Encoding'] == 'gzip', \
+            'Проверьте, что при collectstatic создаются и отдаются сжатые копии'
+        assert gzip.decompress(body) == original
+        assert 'immutable' in headers['Cache-Control']
+        assert headers['Vary'] == 'Accept-Encoding'
+
+        status, headers, body = request(server, url, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        assert 'Content-Encoding' not in headers and body == original
@@ -0,0 +1,111 @@
+import hashlib
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+
+
+def image_bytes(color=(255, 0, 0)):
+    buffer = BytesIO()
+    Image.new('RGB', (50, 50), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def upload(name, content):
+    return SimpleUploadedFile(name, content, content_type='image/png')
+
+
+def media_files():
+    from django.conf import settings
+    return {path for path in Path(settings.MEDIA_ROOT).rglob('*') if path.is_file()}
+
+
+class TestContentAddressedStorage:
+
+    def test_name_is_content_hash(self):
+        from posts.storage import image_storage
+        content = image_bytes()
+        name = image_storage.save('posts/image.PNG', ContentFile(content))
+        digest = hashlib.sha256(content).hexdigest()
+        assert name == f'posts/{digest[:2]}/{digest}.png', \
+            'Файл должен называться по sha256 содержимого'
+        assert image_storage.save('posts/other.png', ContentFile(content)) == name, \
+            'Повторное сохранение того же содержимого должно вернуть то же имя'
+        assert len(media_files()) == 1
+
+    def test_copy_outside_lock(self, monkeypatch):
+        from contextlib import contextmanager
+        from posts.storage import image_storage
+        held = []
+        copied_under_lock = []
+
+        @contextmanager
+        def lock():
+            held.append(True)
+            try:
+                yield
+            finally:
+                held.pop()
+
+        class Content(ContentFile):
+            def chunks(self, chunk_size=None):
+                copied_under_lock.append(bool(held))
+                return super().chunks(chunk_size)
+
+        monkeypatch.setattr(image_storage, 'lock', lock)
+        name = image_storage.save('posts/image.png', Content(image_bytes()))
+        assert Path(image_storage.path(name)).exists()
+        assert copied_under_lock and not any(copied_under_lock), \
+            'Содержимое файла должно копироваться без блокировки хранилища'
+        assert media_files() == {Path(image_storage.path(name))}, \
+            'Временная копия файла не должна оставаться в MEDIA_ROOT'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_posts_share_image(self, user_client):
+        from posts.models import Post
+        content = image_bytes()
+        user_client.post('/new/', {'text': 'Первый пост', 'image': upload('one.png', content)})
+        user_client.post('/new/', {'text': 'Второй пост', 'image': upload('two.png', content)})
+        first, second = Post.objects.order_by('id')
+        assert first.image.name == second.image.name, \
+            'Одинаковые картинки разных постов должны храниться одним файлом'
+        files = media_files()
+        assert Path(first.image.path) in files
+
+        first.delete()
+        assert media_files() == files, \
+            'Файл нельзя удалять, пока на него ссылается другой пост'
+        second.delete()
+        assert not media_files(), \
+            'После удаления последнего поста должны удаляться файл и его миниатюры'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_edit_releases_image(self, user_client, user):
+        from posts.models import Post
+        user_client.post('/new/', {'text': 'Пост', 'image': upload('one.png', image_bytes())})
+        post = Post.objects.get()
+        old_files = media_files()
+        user_client.post(f'/{user.username}/{post.id}/edit/', {
+            'text': 'Пост', 'image': upload('two.png', image_bytes((0, 0, 255)))})
+        post.refresh_from_db()
+        assert post.image.name and Path(post.image.path).exists()
+        assert not old_files & media_files(), \
+            'Картинка, на которую больше не ссылается ни один пост, должна удаляться вместе с миниатюрами'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_reused_file_is_claimed(self):
+        from posts import storage
+        content = image_bytes()
+        name = storage.image_storage.save('posts/one.png', ContentFile(content))
+        storage.take_claims()
+        # параллельная загрузка нашла файл, её пост ещё не закоммичен
+        assert storage.image_storage.save('posts/two.png', ContentFile(content)) == name
+        assert not storage.release(name), \
+            'Файл, который только что переиспользовала загрузка, удалять нельзя'
+        assert storage.image_storage.exists(name)
+        for claimed in storage.take_claims():
+            storage.unclaim(claimed)
+        assert storage.release(name) and not storage.image_storage.exists(name)
@@ -0,0 +1,63 @@
+from io import BytesIO, StringIO
+from pathlib import Path
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from PIL import Image
+
+
+def get_image_file(name, size=(50, 50)):
+    file_obj = BytesIO()
+    Image.new('RGB', size=size, color=(255, 0, 0)).save(file_obj, 'png')
+    return ContentFile(file_obj.getvalue(), name=name)
+
+
+def thumbnails_exist():
+    from django.conf import settings
+    cache_dir = Path(settings.MEDIA_ROOT) / 'cache'
+    return cache_dir.exists() and any(path.is_file() for path in cache_dir.rglob('*'))
+
+
+class TestThumbnails:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_new_post_renders_thumbnails(self, user_client):
+        user_client.post('/new/', data={'text': 'Пост с картинкой', 'image': get_image_file('image.png')})
+        assert thumbnails_exist(), \
+            'Проверьте, что миниатюры создаются при публикации поста'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_render_thumbnails_command(self, user):
+        from posts.models import Post
+        post = Post(text='Пост с картинкой', author=user)
+        post.image.save('image.png', get_image_file('image.png'))
+        assert not thumbnails_exist()
+        call_command('render_thumbnails', workers=0, stdout=StringIO())
+        assert thumbnails_exist(), \
+            'Команда `render_thumbnails` должна создавать недостающие миниатюры'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_picture_markup(self, client, user):
+        from posts.models import Post
+        from posts.thumbnails import render_thumbnails
+        post = Post(text='Пост с картинкой', author=user)
+        post.image.save('image.png', get_image_file('image.png', size=(1200, 600)))
+        render_thumbnails(post.image.name)
+        content = client.get('/').content.decode()
+        assert '<source type="image/webp"' in content, \
+            'Проверьте, что карточка поста предлагает WebP-варианты картинки'
+        assert '320w' in content and '960w' in content, \
+            'Проверьте, что в srcset перечислены все ширины картинки'
+        assert '<img class="card-img"' in content
+
+    @pytest.mark.django_db(transaction=True)
+    def test_picture_not_rendered_by_page(self, client, user):
+        from posts.models import Post
+        post = Post(text='Пост с картинкой', author=user)
+        post.image.save('image.png', get_image_file('image.png', size=(1200, 600)))
+        content = client.get('/').content.decode()
+        assert not thumbnails_exist(), \
+            'Просмотр страницы не должен создавать миниатюры: это работа фонового пула'
+        assert f'<img class="card-img" src="{post.image.url}"' in content, \
+            'Пока миниатюр нет, карточка должна показывать исходную картинку'
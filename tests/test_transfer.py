@@ -0,0 +1,96 @@
+from io import StringIO
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+
+
+class TestTransfer:
+
+    @pytest.fixture
+    def data(self, user, group):
+        from posts.models import Comment, Follow, Post, User
+        author = User.objects.create_user(username='TestAuthor')
+        Follow.objects.create(user=user, author=author)
+        image = default_storage.save('posts/picture.jpg', ContentFile(b'image'))
+        posts = [Post.objects.create(text=f'Пост номер {i}', author=author, group=group,
+                                     image=image if i == 0 else None)
+                 for i in range(5)]
+        Comment.objects.create(post=posts[0], author=user, text='Комментарий')
+        return posts
+
+    def clear(self):
+        from posts.models import FeedEntry, Group, Post, User
+        Post.objects.all().delete()
+        FeedEntry.objects.all().delete()
+        Group.objects.all().delete()
+        User.objects.all().delete()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_export_import(self, tmp_path, user, data):
+        from posts.models import Comment, FeedEntry, Follow, Post
+        from posts.search import search_posts
+        dump, media = tmp_path / 'dump.jsonl.gz', tmp_path / 'dump_media'
+        call_command('export_yatube', str(dump), '--media', str(media), stdout=StringIO())
+        pub_dates = dict(Post.objects.values_list('id', 'pub_date'))
+        self.clear()
+        default_storage.delete('posts/picture.jpg')
+
+        call_command('import_yatube', str(dump), '--batch-size', '2', '--media', str(media),
+                     stdout=StringIO())
+        assert dict(Post.objects.values_list('id', 'pub_date')) == pub_dates, \
+            'Импорт должен сохранять посты вместе с датами публикации из выгрузки'
+        assert Comment.objects.count() == 1 and Follow.objects.count() == 1
+        assert Post.objects.get(pk=data[0].pk).comment_count == 1, \
+            'После импорта должны пересчитываться счётчики комментариев'
+        assert FeedEntry.objects.filter(user=user).count() == 5, \
+            'После импорта должны перестраиваться ленты подписок'
+        assert search_posts('номер').count() == 5, \
+            'После импорта должен перестраиваться поисковый индекс'
+        with default_storage.open('posts/picture.jpg') as file:
+            assert file.read() == b'image', 'Импорт должен переносить файлы картинок'
+        assert not (tmp_path / 'dump.jsonl.gz.checkpoint').exists(), \
+            'После успешного импорта отметка прогресса должна удаляться'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_import_renders_text(self, tmp_path, data):
+        import json
+        from posts.models import Comment, Post
+        dump = tmp_path / 'dump.jsonl'
+        call_command('export_yatube', str(dump), stdout=StringIO())
+        self.clear()
+        script = '<script>alert(1)</script>'
+        records = [json.loads(line) for line in dump.read_text().splitlines()]
+        for record in records:
+            if record['model'] in ('posts.post', 'posts.comment'):
+                record['fields'].update(text=script, text_html=script, excerpt_html=script)
+        dump.write_text('\n'.join(json.dumps(record) for record in records))
+
+        call_command('import_yatube', str(dump), stdout=StringIO())
+        escaped = '&lt;script&gt;alert(1)&lt;/script&gt;'
+        assert set(Post.objects.values_list('text_html', flat=True)) == {escaped}, \
+            'HTML текста из выгрузки не должен попадать в базу без экранирования'
+        assert set(Post.objects.values_list('excerpt_html', flat=True)) == {escaped}
+        assert Comment.objects.get().text_html == escaped
+
+    @pytest.mark.django_db(transaction=True)
+    def test_import_resume(self, tmp_path, data):
+        from posts.models import Post
+        dump = tmp_path / 'dump.jsonl'
+        call_command('export_yatube', str(dump), stdout=StringIO())
+        self.clear()
+        lines = dump.read_text().splitlines()
+        broken = tmp_path / 'broken.jsonl'
+        broken.write_text('\n'.join(lines[:5] + ['{"model": "posts.unknown"}'] + lines[5:]))
+        with pytest.raises(Exception):
+            call_command('import_yatube', str(broken), '--batch-size', '1', stdout=StringIO())
+        checkpoint = tmp_path / 'broken.jsonl.checkpoint'
+        assert checkpoint.exists(), 'Прерванный импорт должен оставлять отметку прогресса'
+
+        # исправленный файл той же длины: импорт продолжается с отметки
+        broken.write_text('\n'.join(lines[:5] + [''] + lines[5:]))
+        output = StringIO()
+        call_command('import_yatube', str(broken), '--batch-size', '1', stdout=output)
+        assert 'Продолжаем со строки' in output.getvalue()
+        assert Post.objects.count() == 5
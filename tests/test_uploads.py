@@ -0,0 +1,91 @@
+import hashlib
+from io import BytesIO
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory
+from PIL import Image
+
+
+def image_file(name='image.png', size=(50, 50)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (255, 0, 0)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class TestImageUpload:
+
+    def test_upload_is_hashed(self):
+        from posts.uploads import accept_images
+        image = image_file()
+        content = image.read()
+        image.seek(0)
+        request = RequestFactory().post('/new/', {'text': 'Текст', 'image': image})
+        request._dont_enforce_csrf_checks = True
+        uploaded = accept_images(lambda request: request.FILES['image'])(request)
+        assert uploaded.sha256 == hashlib.sha256(content).hexdigest(), \
+            'Загрузка должна хешироваться по ходу приёма'
+        assert uploaded.image_size == (50, 50) and uploaded.image_format == 'PNG', \
+            'Размеры картинки должны читаться из заголовка'
+        assert hasattr(uploaded, 'temporary_file_path'), \
+            'Загрузка должна сохраняться во временный файл, а не в память'
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('limit, image', [
+        ('POSTS_UPLOAD_MAX_SIZE', lambda: SimpleUploadedFile('big.png', b'\x89PNG' + b'0' * 200 * 1024)),
+        ('POSTS_UPLOAD_MAX_PIXELS', lambda: image_file(size=(200, 200))),
+    ])
+    def test_upload_limits(self, settings, user_client, limit, image):
+        from posts.models import Post
+        settings.POSTS_UPLOAD_MAX_SIZE = 100 * 1024
+        settings.POSTS_UPLOAD_MAX_PIXELS = 100 * 100
+        response = user_client.post('/new/', {'text': 'Пост с большой картинкой', 'image': image()})
+        assert response.status_code == 200, 'Слишком большая картинка не должна сохраняться'
+        assert 'image' in response.context['form'].errors, \
+            f'Превышение {limit} должно показываться ошибкой поля `image`'
+        assert not Post.objects.exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_not_an_image(self, user_client):
+        from posts.models import Post
+        response = user_client.post('/new/', {
+            'text': 'Пост с текстом вместо картинки',
+            'image': SimpleUploadedFile('text.jpg', 'не картинка'.encode()),
+        })
+        assert 'image' in response.context['form'].errors
+        assert not Post.objects.exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_fields_after_rejected_file(self, settings, user_client):
+        settings.POSTS_UPLOAD_MAX_SIZE = 100
+        response = user_client.post('/new/', {'image': image_file(), 'text': 'Текст после файла'})
+        form = response.context['form']
+        assert 'image' in form.errors and form['text'].value() == 'Текст после файла', \
+            'Поля формы после отклонённого файла не должны теряться'
+
+    def test_default_handlers_elsewhere(self):
+        request = RequestFactory().post('/admin/', {'file': SimpleUploadedFile('notes.txt', b'text')})
+        assert request.FILES['file'].read() == b'text', \
+            'Проверка картинок не должна мешать загрузке других файлов вне форм постов'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_csrf_still_checked(self, user):
+        from django.test import Client
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(user)
+        response = client.post('/new/', {'text': 'Пост без CSRF-токена'})
+        assert response.status_code == 403, 'Форма поста должна проверять CSRF-токен'
+
+    def test_oversized_body_not_read(self, settings):
+        from posts.uploads import accept_images
+        request = RequestFactory().post('/new/', {'text': 'Текст', 'image': image_file()})
+        request._dont_enforce_csrf_checks = True
+        request.META['CONTENT_LENGTH'] = str(
+            settings.POSTS_UPLOAD_MAX_SIZE + settings.DATA_UPLOAD_MAX_MEMORY_SIZE + 1)
+        remaining = request._stream.remaining
+        response = accept_images(lambda request: request.FILES['image'])(request)
+        assert response.status_code == 413, \
+            'Запрос с заведомо слишком большим Content-Length должен отклоняться ответом 413'
+        assert request._stream.remaining == remaining, \
+            'Тело слишком большого запроса не должно читаться'
+        assert 'Файл больше' in response.content.decode()
@@ -0,0 +1,183 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+Django 2.2 cannot run async views, so the WSGI application is served through
+a small ASGI adapter: the ASGI server reads request bodies (slow image uploads
+included) asynchronously, spooling them to a temporary file, and only hands a
+complete request to a worker thread. Static and media files are served by the
+same ``yatube.static.FileServer`` as under WSGI. Views, ORM and Pillow calls
+run in a pool of ``ASGI_THREADS`` threads. Bodies larger than
+``ASGI_MAX_BODY_SIZE`` are answered with 413 without reaching Django.
+
+Run with an ASGI server, e.g.::
+
+    uvicorn yatube.asgi:application --workers 2
+"""
+
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+
+# yatube.wsgi sets DJANGO_SETTINGS_MODULE before settings are read
+from yatube.wsgi import application as wsgi_application
+
+# request bodies larger than this are spooled to disk
+SPOOL_SIZE = 64 * 1024
+
+
+def build_environ(scope, body):
+    """WSGI environ (PEP 3333) for an ASGI HTTP ``scope``."""
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if path.startswith(root_path):
+        path = path[len(root_path):]
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode().decode('latin1'),
+        'PATH_INFO': path.encode().decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    server = scope.get('server') or ('localhost', 80)
+    environ['SERVER_NAME'] = server[0]
+    environ['SERVER_PORT'] = str(server[1] or 0)
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+        environ['REMOTE_PORT'] = str(scope['client'][1])
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1')
+        value = value.decode('latin1')
+        if name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        elif name == 'content-type':
+            key = 'CONTENT_TYPE'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        if key in environ:
+            separator = '; ' if key == 'HTTP_COOKIE' else ','
+            value = environ[key] + separator + value
+        environ[key] = value
+    return environ
+
+
+def declared_length(scope):
+    """Content-Length of the request, None if absent or malformed."""
+    for name, value in scope.get('headers', []):
+        if name.lower() == b'content-length':
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+class ThreadPoolWsgiToAsgi:
+    """ASGI application serving a WSGI one. Requests run concurrently in a
+    bounded thread pool (``loop.run_in_executor``); the response is sent
+    back to the event loop chunk by chunk, so large files are streamed."""
+
+    def __init__(self, wsgi_application, max_workers, max_body_size=None):
+        self.wsgi_application = wsgi_application
+        self.max_body_size = max_body_size
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f'Unsupported ASGI scope type {scope["type"]}')
+        if self.too_large(declared_length(scope)):
+            return await self.reject_too_large(send)
+        with SpooledTemporaryFile(max_size=SPOOL_SIZE) as body:
+            size = 0
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                chunk = message.get('body', b'')
+                size += len(chunk)
+                if self.too_large(size):
+                    # the rest of the body is neither read nor spooled
+                    return await self.reject_too_large(send)
+                body.write(chunk)
+                if not message.get('more_body', False):
+                    break
+            body.seek(0)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.executor, self.run_wsgi,
+                                       build_environ(scope, body), send, loop)
+
+    def too_large(self, size):
+        return (self.max_body_size is not None and size is not None
+                and size > self.max_body_size)
+
+    async def reject_too_large(self, send):
+        await send({'type': 'http.response.start', 'status': 413,
+                    'headers': [(b'content-type', b'text/plain')]})
+        await send({'type': 'http.response.body',
+                    'body': b'Request body is too large'})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def run_wsgi(self, environ, send, loop):
+        """Runs in a pool thread; every ``send`` goes through the loop."""
+        def send_message(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        response = {'started': False}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response['started']:
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['start'] = {
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [(name.lower().encode('latin1'),
+                             value.encode('latin1'))
+                            for name, value in headers],
+            }
+
+        def start():
+            # WSGI allows start_response to be called while iterating
+            if not response['started']:
+                send_message(response['start'])
+                response['started'] = True
+
+        result = self.wsgi_application(environ, start_response)
+        try:
+            for chunk in result:
+                if chunk:
+                    start()
+                    send_message({'type': 'http.response.body',
+                                  'body': chunk, 'more_body': True})
+            start()
+            send_message({'type': 'http.response.body', 'body': b''})
+        finally:
+            close = getattr(result, 'close', None)
+            if close is not None:
+                close()
+
+
+application = ThreadPoolWsgiToAsgi(wsgi_application, settings.ASGI_THREADS,
+                                   settings.ASGI_MAX_BODY_SIZE)
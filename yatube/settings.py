@@ -1,6 +1,7 @@
 import os
 import environ
 import sentry_sdk
+from django.core.exceptions import ImproperlyConfigured
 from sentry_sdk.integrations.django import DjangoIntegration
 
 env = environ.Env()
@@ -56,12 +57,12 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'sorl.thumbnail',
-    'debug_toolbar',
     ]
 
 MIDDLEWARE = [
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'posts.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'posts.db.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -70,12 +71,18 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',    
 ]
 
+# debug_toolbar нужен только при разработке
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.insert(0, 'debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени рендеринга для posts.metrics
+        'BACKEND': 'posts.metrics.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -91,6 +98,12 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+# Потоки, в которых yatube.asgi выполняет запросы
+ASGI_THREADS = env.int('ASGI_THREADS', default=(os.cpu_count() or 1) * 4)
+# Больший запрос yatube.asgi отклоняет ответом 413, не дочитывая тело и не
+# передавая его Django; должен вмещать POSTS_UPLOAD_MAX_SIZE и поля формы
+ASGI_MAX_BODY_SIZE = env.int('ASGI_MAX_BODY_SIZE', default=16 * 1024 * 1024)
+
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
@@ -98,6 +111,56 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 DATABASES = {
     'default': env.db(),
     }
+# Постоянные соединения: сколько секунд держать соединение между запросами
+# (0 - новое соединение на каждый запрос); ?conn_max_age= в DATABASE_URL
+# важнее. Перед повторным использованием соединение проверяется (posts.db)
+DATABASES['default'].setdefault(
+    'CONN_MAX_AGE', env.int('DATABASE_CONN_MAX_AGE', default=60))
+DATABASES['default']['CONN_HEALTH_CHECKS'] = env.bool(
+    'DATABASE_CONN_HEALTH_CHECKS', default=True)
+# Реплики только для чтения: DATABASE_REPLICA_URLS=postgres://...,...
+# Безопасные запросы читают со случайной реплики, запись и чтение в
+# ближайшие POSTS_REPLICA_PIN_SECONDS секунд после записи того же
+# пользователя - с основной базы (posts.db.ReplicaRouter). В тестах
+# реплики смотрят в тестовую основную базу
+for number, url in enumerate(env.list('DATABASE_REPLICA_URLS', default=[]),
+                             1):
+    replica = env.db_url_config(url)
+    replica.setdefault('CONN_MAX_AGE', DATABASES['default']['CONN_MAX_AGE'])
+    replica['CONN_HEALTH_CHECKS'] = DATABASES['default']['CONN_HEALTH_CHECKS']
+    replica['TEST'] = {'MIRROR': 'default'}
+    DATABASES[f'replica{number}'] = replica
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['posts.db.ReplicaRouter']
+POSTS_REPLICA_PIN_SECONDS = env.int('POSTS_REPLICA_PIN_SECONDS', default=15)
+# Пул соединений внутри процесса (нужен django-db-connection-pool, см.
+# requirements-pool.txt) для PostgreSQL и MySQL: соединения
+# переиспользуются всеми потоками воркера, а не держатся каждым потоком
+# отдельно
+DATABASE_POOL_SIZE = env.int('DATABASE_POOL_SIZE', default=0)
+POOL_BACKENDS = {
+    'django.db.backends.postgresql': 'dj_db_conn_pool.backends.postgresql',
+    'django.db.backends.postgresql_psycopg2':
+        'dj_db_conn_pool.backends.postgresql',
+    'django.db.backends.mysql': 'dj_db_conn_pool.backends.mysql',
+}
+if DATABASE_POOL_SIZE:
+    for alias, database in DATABASES.items():
+        if database['ENGINE'] not in POOL_BACKENDS:
+            raise ImproperlyConfigured(
+                f'DATABASE_POOL_SIZE поддерживается только для PostgreSQL '
+                f'и MySQL, а у базы {alias} {database["ENGINE"]}')
+        database.update({
+            'ENGINE': POOL_BACKENDS[database['ENGINE']],
+            'POOL_OPTIONS': {
+                'POOL_SIZE': DATABASE_POOL_SIZE,
+                'MAX_OVERFLOW': env.int('DATABASE_POOL_OVERFLOW',
+                                        default=10),
+                'RECYCLE': env.int('DATABASE_POOL_RECYCLE', default=300),
+            },
+            # соединение возвращается в пул после каждого запроса
+            'CONN_MAX_AGE': 0,
+        })
 
 
 # Password validation
@@ -137,8 +200,12 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 STATIC_URL = '/static/'
 # теперь логотип можно будет запросить по адресу sitename.ex**/static/**images/logo.png
-# задаём адрес директории, куда командой *collectstatic* будет собрана вся статика
-STATIC_ROOT = os.path.join(BASE_DIR, "static")
+# исходники статики лежат в static/, командой *collectstatic* они собираются
+# в STATIC_ROOT под именами с хешем содержимого, со сжатыми копиями .gz/.br
+STATICFILES_DIRS = [os.path.join(BASE_DIR, "static")]
+STATIC_ROOT = env.str('STATIC_ROOT',
+                      default=os.path.join(BASE_DIR, "staticfiles"))
+STATICFILES_STORAGE = 'yatube.static.CompressedManifestStaticFilesStorage'
 
 
 MEDIA_URL = '/media/'
@@ -159,8 +226,43 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 SITE_ID = 1
 
 #Для подключения бэкенда кеширования
+# Кеш общий для всех воркеров: по умолчанию файловый, в продакшене
+# CACHE_URL=rediscache://... (нужен django-redis) или memcache://...
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
-} 
\ No newline at end of file
+    'default': env.cache(
+        'CACHE_URL',
+        default='filecache://' + os.path.join(BASE_DIR, 'cache')
+                + '?max_entries=10000'),
+}
+
+# Курсорная (keyset) паджинация лент вместо постраничной с COUNT/OFFSET
+POSTS_CURSOR_PAGINATION = env.bool('POSTS_CURSOR_PAGINATION', default=False)
+
+# Посты авторов, у которых подписчиков больше этого числа, не раскладываются
+# по лентам при публикации, а подмешиваются в ленту подписок при чтении
+POSTS_FEED_FANOUT_MAX_FOLLOWERS = env.int('POSTS_FEED_FANOUT_MAX_FOLLOWERS',
+                                          default=5000)
+# Сколько последних постов автора попадает в ленту сразу после подписки
+POSTS_FEED_BACKFILL = env.int('POSTS_FEED_BACKFILL', default=1000)
+
+# Потоки для фоновой подготовки миниатюр; 0 - создавать сразу в запросе
+POSTS_THUMBNAIL_WORKERS = env.int('POSTS_THUMBNAIL_WORKERS', default=2)
+# Доля запросов, для которых замеряются БД, шаблоны и кеш (время ответа
+# и число запросов считаются всегда); метрики - на /-/metrics/
+POSTS_METRICS_SAMPLE_RATE = env.float('POSTS_METRICS_SAMPLE_RATE',
+                                      default=0.1)
+# Отдавать замеры в заголовке Server-Timing
+POSTS_METRICS_SERVER_TIMING = env.bool('POSTS_METRICS_SERVER_TIMING',
+                                       default=True)
+# Токен для /-/metrics/ (заголовок `Authorization: Bearer <токен>`); без
+# него метрики видят только суперпользователи
+POSTS_METRICS_TOKEN = env.str('POSTS_METRICS_TOKEN', default='')
+# Картинки постов принимаются потоком во временный файл с ранней проверкой
+# размера файла и размеров картинки по заголовку (см. posts.uploads)
+POSTS_UPLOAD_MAX_SIZE = env.int('POSTS_UPLOAD_MAX_SIZE',
+                                default=10 * 1024 * 1024)
+POSTS_UPLOAD_MAX_PIXELS = env.int('POSTS_UPLOAD_MAX_PIXELS',
+                                  default=40 * 1000 * 1000)
+# Статику и медиа отдаёт само WSGI-приложение (yatube.static.FileServer);
+# False - если их отдаёт nginx или CDN
+SERVE_FILES = env.bool('SERVE_FILES', default=True)
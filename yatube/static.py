@@ -0,0 +1,183 @@
+"""Статика и медиа в продакшене.
+
+`CompressedManifestStaticFilesStorage` (`STATICFILES_STORAGE`) даёт
+собранным файлам имена с хешем содержимого и при collectstatic кладёт
+рядом с текстовыми файлами их `.gz`-копии, а если установлен
+необязательный пакет `brotli`, то и `.br`-копии.
+
+`FileServer` оборачивает WSGI-приложение и отдаёт файлы из `STATIC_ROOT` и
+`MEDIA_ROOT` раньше любых middleware. Файлы отправляются через
+`wsgi.file_wrapper` (gunicorn и uWSGI превращают его в `sendfile`),
+сжатая копия выбирается по `Accept-Encoding`, а файлы с хешем содержимого
+в имени кешируются как неизменяемые. Всё, что не файл, обрабатывает
+Django.
+"""
+
+import gzip
+import mimetypes
+import os
+import re
+from stat import S_ISREG
+from wsgiref.util import FileWrapper
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage, staticfiles_storage)
+from django.utils.http import http_date, parse_http_date_safe
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.html',
+                '.xml', '.ico')
+# сжатая копия сохраняется, только если она хотя бы настолько меньше
+MIN_SAVING = 0.05
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+BLOCK_SIZE = 64 * 1024
+# картинки постов (posts.storage, sha256) и миниатюры sorl (md5 имени
+# исходника и опций) под тем же именем никогда не меняются
+HASHED_MEDIA = re.compile(r'(?:^|/)(?:[0-9a-f]{64}|[0-9a-f]{32})\.\w+$')
+
+
+def compressors():
+    """(coding, суффикс, функция сжатия) в порядке предпочтения."""
+    if brotli is not None:
+        yield 'br', '.br', brotli.compress
+    yield 'gzip', '.gz', lambda data: gzip.compress(data, 9, mtime=0)
+
+
+def compress(path):
+    """Записывает сжатые копии файла `path` рядом с ним."""
+    with open(path, 'rb') as file:
+        data = file.read()
+    for _, suffix, compress_data in compressors():
+        compressed = compress_data(data)
+        if len(compressed) <= len(data) * (1 - MIN_SAVING):
+            with open(path + suffix, 'wb') as file:
+                file.write(compressed)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+
+    def stored_name(self, name):
+        # без манифеста (collectstatic не запускали: разработка, тесты)
+        # файлы сохраняют свои имена и находятся finders
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            if name.endswith(COMPRESSIBLE):
+                compress(self.path(name))
+
+
+def accepts(header, coding):
+    for item in header.split(','):
+        token, _, params = item.partition(';')
+        if token.strip().lower() != coding:
+            continue
+        params = params.replace(' ', '')
+        return params not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+class FileServer:
+    """WSGI-middleware, которое отдаёт статику и медиа."""
+
+    def __init__(self, application):
+        self.application = application
+        self.static_names = frozenset(
+            getattr(staticfiles_storage, 'hashed_files', {}).values())
+        self.routes = [
+            (settings.STATIC_URL, settings.STATIC_ROOT,
+             self.static_names.__contains__),
+            (settings.MEDIA_URL, settings.MEDIA_ROOT,
+             lambda name: HASHED_MEDIA.search(name) is not None),
+        ]
+
+    def __call__(self, environ, start_response):
+        if environ['REQUEST_METHOD'] in ('GET', 'HEAD'):
+            found = self.find(environ.get('PATH_INFO', ''))
+            if found is not None:
+                return self.serve(environ, start_response, *found)
+        return self.application(environ, start_response)
+
+    def find(self, path_info):
+        """(path, name, stat, immutable) запрошенного файла или None."""
+        try:
+            path_info = path_info.encode('iso-8859-1').decode()
+        except UnicodeError:
+            return None
+        for prefix, root, immutable in self.routes:
+            if not root or not path_info.startswith(prefix):
+                continue
+            name = path_info[len(prefix):]
+            parts = name.split('/')
+            if any(part in ('', '.', '..') or '\\' in part or '\0' in part
+                   for part in parts):
+                return None
+            path = os.path.join(root, *parts)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return None
+            if not S_ISREG(stat.st_mode):
+                return None
+            return path, name, stat, immutable(name)
+        return None
+
+    def serve(self, environ, start_response, path, name, stat, immutable):
+        content_type, _ = mimetypes.guess_type(name)
+        headers = [
+            ('Content-Type', content_type or 'application/octet-stream'),
+            ('Cache-Control', IMMUTABLE if immutable else REVALIDATE),
+            ('X-Content-Type-Options', 'nosniff'),
+        ]
+        encoding = None
+        if name.endswith(COMPRESSIBLE):
+            path, stat, encoding = self.negotiate(
+                path, stat, environ.get('HTTP_ACCEPT_ENCODING', ''))
+            headers.append(('Vary', 'Accept-Encoding'))
+            if encoding:
+                headers.append(('Content-Encoding', encoding))
+        etag = '"%x-%x%s"' % (stat.st_mtime_ns, stat.st_size,
+                              '-' + encoding if encoding else '')
+        headers += [('ETag', etag),
+                    ('Last-Modified', http_date(stat.st_mtime))]
+
+        if self.not_modified(environ, etag, stat.st_mtime):
+            start_response('304 Not Modified', headers)
+            return []
+        headers.append(('Content-Length', str(stat.st_size)))
+        start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        file_wrapper = environ.get('wsgi.file_wrapper', FileWrapper)
+        return file_wrapper(open(path, 'rb'), BLOCK_SIZE)
+
+    def negotiate(self, path, stat, accept_encoding):
+        for coding, suffix, _ in compressors():
+            if not accepts(accept_encoding, coding):
+                continue
+            try:
+                return path + suffix, os.stat(path + suffix), coding
+            except OSError:
+                continue
+        return path, stat, None
+
+    def not_modified(self, environ, etag, mtime):
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            return if_none_match.strip() == '*' or etag in [
+                tag.strip() for tag in if_none_match.split(',')]
+        if_modified_since = parse_http_date_safe(
+            environ.get('HTTP_IF_MODIFIED_SINCE', ''))
+        return (if_modified_since is not None
+                and int(mtime) <= if_modified_since)
@@ -3,7 +3,8 @@ from django.urls import include, path
 from django.contrib.flatpages import views
 from django.conf.urls import handler404, handler500
 from django.conf import settings
-from django.conf.urls.static import static
+
+from posts.metrics import metrics_view
 
 urlpatterns = [
     # раздел администратора
@@ -11,6 +12,10 @@ urlpatterns = [
     # регистрация и авторизация
     path("auth/", include("users.urls")),
     path("auth/", include("django.contrib.auth.urls")),
+    # метрики для Prometheus
+    path("-/metrics/", metrics_view, name="metrics"),
+    # JSON API лент
+    path("api/v1/", include("posts.api_urls")),
     # импорт из приложения posts
     path("", include("posts.urls")),
     # flatpages
@@ -31,6 +36,4 @@ handler500 = "posts.views.server_error"   # noqa
 if settings.DEBUG:
     import debug_toolbar
 
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
     urlpatterns += path("__debug__/", include(debug_toolbar.urls)),